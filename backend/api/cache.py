@@ -0,0 +1,48 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = "version:{}"
+
+
+def get_cache_versions(*names):
+    """
+    Возвращает версии именованных пространств кэша.
+    Вытесненная из кэша версия создается заново.
+    """
+
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    stored = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for name, key in keys.items():
+        if key in stored:
+            versions[name] = stored[key]
+        else:
+            versions[name] = missing[key] = time.time_ns()
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+
+def get_cache_version(name):
+    return get_cache_versions(name)[name]
+
+
+def bump_cache_versions(*names):
+    """Делает недействительными все записи, привязанные к версиям names."""
+
+    now = time.time_ns()
+    cache.set_many({VERSION_KEY.format(name): now for name in names}, None)
+
+
+def cache_stream(chunks, key, timeout):
+    """Отдает части потокового ответа и сохраняет их в кэш целиком."""
+
+    content = []
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        content.append(chunk)
+        yield chunk
+    cache.set(key, b"".join(content), timeout)
@@ -2,7 +2,7 @@ RECIPE_NOT_EXIST = "Рецепта с id={} не существует"
 
 ALREADY_IN_RECIPE_LIST = 'Рецепт "{}" уже добавлен'
 
-FILENAME = "shopping_list({}).txt"
+FILENAME = "shopping_list({}).{}"
 
 SELF_SUBSCRIBE_ERROR = {"subscribe": "Нельзя подписаться на самого себя."}
 
@@ -34,12 +34,51 @@ MIN_VALUE_AMOUNT: int = 1
 
 RECIPE_NOT_FOUND = "Рецепт с id = {} не найден."
 
+INVALID_CURSOR = "Неверный курсор."
+
 HEADER_ROW = "Список продуктов пользователя {} на {}"
 
 INGREDIENT_ROW = "{}. {}: {} {}"
 
 RECIPES_ROW = "{} (@{})"
 
+CSV_HEADER_ROW = ("№", "Продукт", "Количество", "Единица измерения")
+
+SHOPPING_CART_VERSION = "shopping_cart:{}"
+
+SHOPPING_LIST_CACHE_KEY = "shopping_list:{}:{}:{}:{}"
+
+SHOPPING_LIST_CACHE_TIMEOUT: int = 24 * 60 * 60
+
+MEMBERSHIP_VERSION = "membership:{}"
+
+MEMBERSHIP_CACHE_KEY = "membership:{}:{}"
+
+MEMBERSHIP_CACHE_TIMEOUT: int = 60 * 60
+
+# Кэш ответов анонимным пользователям и версии, от которых он зависит.
+RESPONSE_CACHE_KEY = "anonymous:{}:{}"
+
+RESPONSE_CACHE_STATS_KEY = "anonymous:stats:{}"
+
+RESPONSE_CACHE_QUERY_PARAMS = ("tags", "author", "page", "limit")
+
+FEED_VERSION = "recipes:feed"
+
+RECIPE_VERSION = "recipe:{}"
+
+AUTHOR_VERSION = "author:{}"
+
+AUTHOR_RECIPES_VERSION = "author_recipes:{}"
+
+TAG_RECIPES_VERSION = "tag_recipes:{}"
+
+PDF_FONT_NAME = "ShoppingListFont"
+
+PDF_FONT_SIZE: int = 12
+
+PDF_MARGIN: int = 50
+
 DATE_FORMAT = "d E Y"
 
 LETTER_COUNT: int = 21
@@ -50,3 +89,71 @@ CHOICES = (
     ("yes", "Да"),
     ("no", "Нет"),
 )
+
+COOKING_TIME_FILTER_CACHE_KEY = "admin:cooking_time_buckets"
+
+ADMIN_FILTER_CACHE_TIMEOUT: int = 60
+
+# Варианты изображений: {название: наибольшая сторона в пикселях}.
+RECIPE_IMAGE_VARIANTS = {"thumb": 80, "card": 480, "detail": 1200}
+
+AVATAR_IMAGE_VARIANTS = {"thumb": 80, "avatar": 240}
+
+# Форматы вариантов: {расширение: (формат Pillow, качество)}.
+IMAGE_VARIANT_FORMATS = {"webp": ("WEBP", 80), "jpeg": ("JPEG", 85)}
+
+IMAGE_VARIANTS_DIR = "variants"
+
+MEDIA_NAME_LENGTH: int = 255
+
+SEARCH_CONFIG = "russian"
+
+MAX_AVAILABLE_INGREDIENTS: int = 100
+
+INVALID_ID_LIST = "Ожидаются целые id через запятую."
+
+TOO_MANY_ITEMS = "Не больше {} значений."
+
+SIMILAR_RECIPES_COUNT: int = 10
+
+# Сколько кандидатов по общим продуктам оценивается для одного рецепта.
+SIMILAR_CANDIDATES: int = 200
+
+# Продукты и теги, встречающиеся в большем числе рецептов,
+# не используются для поиска кандидатов (но учитываются в оценке).
+SIMILAR_MAX_POSTING: int = 1000
+
+# Тег с id N занимает бит N - 1 в Recipe.tags_mask; теги с большими id
+# в маску не попадают и фильтруются через таблицу связей.
+TAGS_MASK_BITS: int = 62
+
+# Бюджеты SQL-запросов маршрутов на холодных кэшах, включая запросы
+# on_commit: {(имя маршрута, HTTP-метод): допустимое число запросов}.
+QUERY_BUDGETS = {
+    ("api:ingredient-list", "GET"): 2,
+    ("api:ingredient-detail", "GET"): 2,
+    ("api:tag-list", "GET"): 2,
+    ("api:tag-detail", "GET"): 2,
+    ("api:recipes-list", "GET"): 7,
+    ("api:recipes-list", "POST"): 32,
+    ("api:recipes-detail", "GET"): 5,
+    ("api:recipes-detail", "PATCH"): 40,
+    ("api:recipes-detail", "DELETE"): 30,
+    ("api:recipes-by-ingredients", "GET"): 7,
+    ("api:recipes-similar", "GET"): 2,
+    ("api:recipes-favorite", "POST"): 8,
+    ("api:recipes-favorite", "DELETE"): 8,
+    ("api:recipes-shopping-cart", "POST"): 14,
+    ("api:recipes-shopping-cart", "DELETE"): 14,
+    ("api:recipes-get-link", "GET"): 2,
+    ("api:recipes-download-shopping-cart", "GET"): 3,
+    ("api:user-list", "GET"): 4,
+    ("api:user-list", "POST"): 5,
+    ("api:user-detail", "GET"): 2,
+    ("api:user-me", "GET"): 2,
+    ("api:user-me-avatar", "PUT"): 7,
+    ("api:user-me-avatar", "DELETE"): 7,
+    ("api:user-subscriptions", "GET"): 4,
+    ("api:user-create-delete-subscribe", "POST"): 10,
+    ("api:user-create-delete-subscribe", "DELETE"): 7,
+}
@@ -1,6 +1,14 @@
 import django_filters
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
 
-from recipes.models import Ingredient, Recipe, Tag, User
+from recipes.models import (
+    Favorite, Recipe, RecipeIngredients, ShoppingCart, User
+)
+from recipes.tags import tag_bit, tags_mask
+from .constants import SEARCH_CONFIG
+from .reference import get_snapshot
 
 
 class LimitFilter(django_filters.FilterSet):
@@ -16,24 +24,25 @@ class LimitFilter(django_filters.FilterSet):
         return authors[:int(value)] if value else authors
 
 
-class NameFilter(django_filters.FilterSet):
-    """Фильтр для поиска ингредиентов по имени."""
-
-    name = django_filters.CharFilter(
-        field_name="name",
-        lookup_expr="startswith"
-    )
-
-    class Meta:
-        model = Ingredient
-        fields = ("name",)
+def tag_choices():
+    return [
+        (slug, tag['name'])
+        for slug, tag in get_snapshot().tags_by_slug.items()
+    ]
 
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    """
+    Фильтр рецептов. Параметр search ищет по названию, описанию
+    и продуктам и упорядочивает результат по релевантности
+    (в курсорном режиме пагинации порядок остается по дате).
+    Теги, избранное и покупки проверяются через EXISTS, а не JOIN,
+    поэтому рецепты не дублируются и DISTINCT не нужен.
+    """
+
+    search = django_filters.CharFilter(method='filter_search')
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_choices, method='filter_tags'
     )
     is_favorited = django_filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = django_filters.NumberFilter(
@@ -44,15 +53,64 @@ class RecipeFilter(django_filters.FilterSet):
         model = Recipe
         fields = ('is_favorited', 'is_in_shopping_cart', 'tags', 'author',)
 
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                value, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            queryset = queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            )
+        else:
+            # Без PostgreSQL: поиск подстроки, совпадения в названии выше.
+            queryset = queryset.filter(
+                Q(name__icontains=value)
+                | Q(text__icontains=value)
+                | Exists(
+                    RecipeIngredients.objects.filter(
+                        recipe=OuterRef('pk'),
+                        ingredient__name__icontains=value,
+                    )
+                )
+            ).annotate(
+                search_rank=Case(
+                    When(name__icontains=value, then=Value(1.0)),
+                    default=Value(0.0),
+                )
+            )
+        return queryset.order_by('-search_rank', *Recipe._meta.ordering)
+
+    def filter_tags(self, queryset, name, value):
+        tags_by_slug = get_snapshot().tags_by_slug
+        tag_ids = [tags_by_slug[slug]['id'] for slug in value]
+        if all(tag_bit(tag_id) for tag_id in tag_ids):
+            # Условие на одну таблицу: любой из битов тегов в маске.
+            return queryset.alias(
+                tag_bits=F('tags_mask').bitand(tags_mask(tag_ids))
+            ).filter(tag_bits__gt=0)
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag_id__in=tag_ids
+                )
+            )
+        )
+
     def filter_is_favorited(self, queryset, name, value):
-        user = getattr(self.request, 'user', None)
-        if value == 1 and user and user.is_authenticated:
-            return queryset.filter(favorites__user=user)
-        return queryset
+        return self.filter_user_recipes(queryset, value, Favorite)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        print(value)
-        if value == 1 and not user.is_anonymous:
-            return queryset.filter(shoppingcarts__user=user)
+        return self.filter_user_recipes(queryset, value, ShoppingCart)
+
+    def filter_user_recipes(self, queryset, value, model):
+        user = getattr(self.request, 'user', None)
+        if value == 1 and user and user.is_authenticated:
+            return queryset.filter(
+                Exists(
+                    model.objects.filter(user=user, recipe=OuterRef('pk'))
+                )
+            )
         return queryset
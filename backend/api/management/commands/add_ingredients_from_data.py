@@ -1,36 +1,12 @@
-import json
-import os
-
-from django.conf import settings
-from django.core.management.base import BaseCommand, CommandError
-from django.db.utils import IntegrityError
-from django.utils.translation import gettext as _
-
+from api.management.loaders import LoadCatalogCommand
 from recipes.models import Ingredient
 
-DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
-
-
-class Command(BaseCommand):
-
-    def add_arguments(self, parser):
-        parser.add_argument('filename', default='ingredients.json', nargs='?',
-                            type=str)
 
-    def handle(self, *args, **options):
-        try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as file:
-                data = json.load(file)
-                for ingredient in data:
-                    try:
-                        Ingredient.objects.create(name=ingredient["name"],
-                                                  measurement_unit=ingredient[
-                                                      "measurement_unit"])
-                    except IntegrityError:
-                        print(f'Ingredient {ingredient["name"]} '
-                              f'{ingredient["measurement_unit"]} '
-                              f'already added to the database')
+class Command(LoadCatalogCommand):
+    """Команда для загрузки ингредиентов в базу данных."""
 
-        except FileNotFoundError:
-            raise CommandError(_('The file is missing in the data folder'))
+    help = "Загрузка ингредиентов в базу данных из JSON или CSV"
+    model = Ingredient
+    fields = ("name", "measurement_unit")
+    unique_fields = (("name", "measurement_unit"),)
+    default_filename = "ingredients.json"
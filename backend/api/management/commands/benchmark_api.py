@@ -0,0 +1,291 @@
+import json
+import platform
+import time
+import tracemalloc
+from dataclasses import dataclass
+from itertools import combinations
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.queries import collect_queries
+from recipes.models import (
+    Favorite, Follow, Ingredient, Recipe, ShoppingCart, Tag, User
+)
+
+ITERATIONS = 50
+WARMUP = 3
+THRESHOLD = 0.2
+RECIPE_FILTERS = ("author", "tags", "is_favorited", "is_in_shopping_cart")
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Scenario:
+    """Маршрут для замера и запросы, выполняемые до и после него."""
+
+    name: str
+    url: str
+    method: str = "get"
+    before: tuple = None
+    after: tuple = None
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+
+    values = sorted(values)
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(index)]
+
+
+class Command(BaseCommand):
+    """Команда для замера производительности основных маршрутов API."""
+
+    help = (
+        "Прогоняет основные маршруты API внутри процесса и сообщает "
+        "p50/p95/p99, пропускную способность, число SQL-запросов и пиковую "
+        "память; сравнивает результат с сохраненным базовым замером"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=ITERATIONS)
+        parser.add_argument("--warmup", type=int, default=WARMUP)
+        parser.add_argument(
+            "--user",
+            help="Логин пользователя, от имени которого идут запросы",
+        )
+        parser.add_argument(
+            "--only", help="Подстрока в названии замеряемых маршрутов"
+        )
+        parser.add_argument("--output", help="Файл для результатов в JSON")
+        parser.add_argument("--baseline", help="JSON базового замера")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=THRESHOLD,
+            help="Допустимое относительное ухудшение p95 (0.2 — 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["user"])
+        self.client = APIClient(SERVER_NAME=self.get_host())
+        self.client.force_authenticate(user)
+        results = {}
+        for scenario in self.get_scenarios(user):
+            if options["only"] and options["only"] not in scenario.name:
+                continue
+            results[scenario.name] = result = self.measure(
+                scenario, options["iterations"], options["warmup"]
+            )
+            self.stdout.write(
+                f"{scenario.name:<45} p50 {result['p50_ms']:>8.2f} мс  "
+                f"p95 {result['p95_ms']:>8.2f} мс  "
+                f"p99 {result['p99_ms']:>8.2f} мс  "
+                f"{result['rps']:>8.1f} rps  "
+                f"SQL {result['queries']:>3}  "
+                f"{result['peak_memory_kb']:>8.1f} КБ"
+            )
+        report = {"meta": self.get_meta(user, options), "routes": results}
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["threshold"])
+
+    def get_host(self):
+        return next(
+            (
+                host for host in settings.ALLOWED_HOSTS
+                if "*" not in host and not host.startswith(".")
+            ),
+            "localhost",
+        )
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {username} не найден")
+        user = User.objects.order_by("-following_count", "id").first()
+        if user is None:
+            raise CommandError(
+                "База пуста, сначала выполните generate_dataset"
+            )
+        return user
+
+    def get_scenarios(self, user):
+        recipe = Recipe.objects.order_by("-favorites_count", "id").first()
+        if recipe is None:
+            raise CommandError("Нет рецептов, выполните generate_dataset")
+        tag = Tag.objects.order_by("id").first()
+        params = {
+            "author": (
+                Follow.objects.filter(user=user)
+                .values_list("subscribing_id", flat=True)
+                .first()
+                or recipe.author_id
+            ),
+            "tags": tag.slug if tag else "",
+            "is_favorited": 1,
+            "is_in_shopping_cart": 1,
+        }
+        recipes_url = reverse("api:recipes-list")
+        scenarios = [
+            Scenario(
+                "recipes-list"
+                + (f"[{','.join(names)}]" if names else ""),
+                recipes_url + "?" + "&".join(
+                    f"{name}={params[name]}" for name in names
+                ),
+            )
+            for size in range(len(RECIPE_FILTERS) + 1)
+            for names in combinations(RECIPE_FILTERS, size)
+        ]
+        ingredient = Ingredient.objects.order_by("id").first()
+        scenarios += [
+            Scenario(
+                "recipes-detail",
+                reverse("api:recipes-detail", args=[recipe.pk]),
+            ),
+            Scenario(
+                "ingredients-search",
+                reverse("api:ingredient-list")
+                + f"?name={ingredient.name[:2] if ingredient else ''}",
+            ),
+            Scenario("subscriptions", reverse("api:user-subscriptions")),
+            Scenario(
+                "download-shopping-cart",
+                reverse("api:recipes-download-shopping-cart"),
+            ),
+        ]
+        for name, related in (
+            ("favorite", "favorites"), ("shopping-cart", "shoppingcarts")
+        ):
+            target = (
+                Recipe.objects.exclude(**{f"{related}__user": user})
+                .order_by("id")
+                .first()
+            )
+            if target is None:
+                self.stderr.write(self.style.WARNING(
+                    f"Пропущены {name}-add и {name}-remove: у пользователя "
+                    f"{user.username} все рецепты уже добавлены"
+                ))
+                continue
+            url = reverse(f"api:recipes-{name}", args=[target.pk])
+            scenarios += [
+                Scenario(f"{name}-add", url, "post", after=("delete", url)),
+                Scenario(
+                    f"{name}-remove", url, "delete", before=("post", url)
+                ),
+            ]
+        return scenarios
+
+    def request(self, method, url):
+        response = getattr(self.client, method)(url)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def request_scenario(self, scenario):
+        """Замеряемый запрос; ответ не 2xx делает замер недействительным."""
+
+        response = self.request(scenario.method, scenario.url)
+        if not 200 <= response.status_code < 300:
+            raise CommandError(
+                f"{scenario.name}: ответ {response.status_code}, "
+                "замер недействителен"
+            )
+        return response
+
+    def run(self, scenario):
+        """Выполняет маршрут и возвращает (ответ, время в секундах)."""
+
+        if scenario.before:
+            self.request(*scenario.before)
+        start = time.perf_counter()
+        response = self.request_scenario(scenario)
+        elapsed = time.perf_counter() - start
+        if scenario.after:
+            self.request(*scenario.after)
+        return response, elapsed
+
+    def measure(self, scenario, iterations, warmup):
+        for _ in range(warmup):
+            self.run(scenario)
+        timings = []
+        for _ in range(iterations):
+            response, elapsed = self.run(scenario)
+            timings.append(elapsed)
+        if scenario.before:
+            self.request(*scenario.before)
+        with collect_queries() as collector:
+            response = self.request_scenario(scenario)
+        if scenario.after:
+            self.request(*scenario.after)
+        if scenario.before:
+            self.request(*scenario.before)
+        tracemalloc.start()
+        try:
+            self.request_scenario(scenario)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        if scenario.after:
+            self.request(*scenario.after)
+        result = {
+            f"p{percent}_ms": round(percentile(timings, percent) * 1000, 3)
+            for percent in PERCENTILES
+        }
+        result.update(
+            rps=round(len(timings) / sum(timings), 1),
+            queries=collector.count,
+            peak_memory_kb=round(peak / 1024, 1),
+            status=response.status_code,
+        )
+        return result
+
+    def get_meta(self, user, options):
+        return {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": settings.DATABASES["default"]["ENGINE"],
+            "iterations": options["iterations"],
+            "user": user.username,
+            "dataset": {
+                model._meta.model_name: model.objects.count()
+                for model in (User, Recipe, Favorite, ShoppingCart, Follow)
+            },
+        }
+
+    def compare(self, results, path, threshold):
+        """Падает, если p95 или число запросов хуже базового замера."""
+
+        with open(path, encoding="utf-8") as file:
+            baseline = json.load(file)["routes"]
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            base = baseline[name]
+            if result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{name}: p95 {base['p95_ms']} → {result['p95_ms']} мс"
+                )
+            if result["queries"] > base["queries"]:
+                regressions.append(
+                    f"{name}: SQL {base['queries']} → {result['queries']}"
+                )
+        if regressions:
+            raise CommandError(
+                "Регрессия производительности:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Регрессий относительно базового замера нет"
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.constants import SIMILAR_MAX_POSTING, SIMILAR_RECIPES_COUNT
+from recipes.similarity import BATCH_SIZE, rebuild_similar_recipes
+
+
+class Command(BaseCommand):
+    """Команда для расчета похожих рецептов по всему каталогу."""
+
+    help = (
+        "Считает для каждого рецепта ближайших соседей по коэффициенту "
+        "Жаккара над продуктами и тегами и сохраняет их в таблицу"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k", type=int, default=SIMILAR_RECIPES_COUNT
+        )
+        parser.add_argument(
+            "--max-posting",
+            type=int,
+            default=SIMILAR_MAX_POSTING,
+            help=(
+                "Признаки, встречающиеся чаще, не используются "
+                "для поиска кандидатов"
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = rebuild_similar_recipes(
+            options["top_k"], options["max_posting"], options["batch_size"]
+        )
+        self.stdout.write(
+            f"Похожих рецептов: {written} "
+            f"за {time.perf_counter() - start:.1f} с"
+        )
@@ -0,0 +1,356 @@
+import base64
+import csv
+import io
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection
+from django.utils import timezone
+
+from api.constants import NAME_LENGTH, RECIPE_IMAGE_VARIANTS
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    Tag,
+    User,
+)
+from recipes.images import make_variants
+from recipes.search import update_search_vectors
+from recipes.tags import tags_mask
+
+BATCH_SIZE = 5000
+PLACEHOLDER_IMAGE = "recipes/recipes/placeholder.png"
+PLACEHOLDER_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAH"
+    "ggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+INGREDIENTS_PER_RECIPE = (3, 12)
+TAGS_PER_RECIPE = (1, 3)
+AMOUNT_RANGE = (1, 500)
+COOKING_TIME_RANGE = (5, 180)
+PUBLICATION_PERIOD = timedelta(days=365)
+
+
+def power_law_weights(count, alpha):
+    """Накопленные веса закона Ципфа для рангов 1..count."""
+
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class RowWriter:
+    """
+    Пишет строки пакетами: COPY на PostgreSQL,
+    bulk_create на остальных базах данных.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def write(self, model, objects):
+        written = 0
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return written
+            if connection.vendor == "postgresql":
+                self.copy(model, batch)
+            else:
+                self.bulk_create(model, batch)
+            written += len(batch)
+
+    def copy(self, model, batch):
+        fields = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key or batch[0].pk is not None
+        ]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in batch:
+            writer.writerow(
+                field.get_db_prep_save(getattr(obj, field.attname), connection)
+                for field in fields
+            )
+        buffer.seek(0)
+        columns = ", ".join(
+            connection.ops.quote_name(field.column) for field in fields
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(model._meta.db_table)} "
+                f"({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+    def bulk_create(self, model, batch):
+        # auto_now_add перезаписал бы сгенерированные даты публикации.
+        fields = [
+            field for field in model._meta.concrete_fields
+            if getattr(field, "auto_now_add", False)
+        ]
+        for field in fields:
+            field.auto_now_add = False
+        try:
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+        finally:
+            for field in fields:
+                field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    """Команда для генерации синтетических данных."""
+
+    help = (
+        "Заполняет базу детерминированными синтетическими пользователями, "
+        "рецептами, подписками, избранным и списками покупок "
+        "со степенным распределением популярности"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument("--follows", type=int, default=20000)
+        parser.add_argument("--favorites", type=int, default=100000)
+        parser.add_argument("--carts", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=1.1,
+            help="Показатель степенного распределения популярности",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--prefix",
+            default="load",
+            help="Префикс логинов сгенерированных пользователей",
+        )
+        parser.add_argument("--password", default="password")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.alpha = options["alpha"]
+        self.writer = RowWriter(options["batch_size"])
+        self.ingredients = list(Ingredient.objects.values_list("id", "name"))
+        self.tag_ids = list(Tag.objects.values_list("id", flat=True))
+        if not self.ingredients or not self.tag_ids:
+            raise CommandError(
+                "Сначала загрузите ингредиенты и теги: "
+                "add_ingredients_from_data, add_tags_from_data"
+            )
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Пользователи с префиксом «{prefix}» уже есть, "
+                "укажите другой --prefix"
+            )
+        self.random.shuffle(self.ingredients)
+        self.random.shuffle(self.tag_ids)
+        self.ingredient_weights = power_law_weights(
+            len(self.ingredients), self.alpha
+        )
+        self.tag_weights = power_law_weights(len(self.tag_ids), self.alpha)
+
+        user_ids = self.stage(
+            "Пользователи", self.create_users, options["users"], prefix,
+            options["password"],
+        )
+        if not user_ids:
+            return
+        user_weights = power_law_weights(len(user_ids), self.alpha)
+        recipe_ids = self.stage(
+            "Рецепты", self.create_recipes, options["recipes"], user_ids,
+            user_weights,
+        )
+        self.stage(
+            "Подписки", self.create_pairs, Follow, "subscribing_id",
+            options["follows"], user_ids, user_ids, user_weights,
+        )
+        if recipe_ids:
+            self.stage(
+                "Поисковые векторы", self.update_search_vectors, recipe_ids
+            )
+            recipe_weights = power_law_weights(len(recipe_ids), self.alpha)
+            for model, total in (
+                (Favorite, options["favorites"]),
+                (ShoppingCart, options["carts"]),
+            ):
+                self.stage(
+                    model._meta.verbose_name_plural, self.create_pairs, model,
+                    "recipe_id", total, user_ids, recipe_ids, recipe_weights,
+                )
+        call_command("reconcile_counters", stdout=self.stdout)
+        call_command("rebuild_shopping_cart_totals", stdout=self.stdout)
+        call_command("reconcile_media_files", stdout=self.stdout)
+
+    def stage(self, title, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self.stdout.write(
+            f"{title}: {self.written} строк "
+            f"за {time.perf_counter() - start:.1f} с"
+        )
+        return result
+
+    def next_id(self, model):
+        return (
+            model.objects.order_by("-pk").values_list("pk", flat=True).first()
+            or 0
+        ) + 1
+
+    def create_users(self, count, prefix, password):
+        password = make_password(password)
+        now = timezone.now()
+        first_id = self.next_id(User)
+        self.written = self.writer.write(
+            User,
+            (
+                User(
+                    id=first_id + number,
+                    username=f"{prefix}{number}",
+                    email=f"{prefix}{number}@example.com",
+                    first_name=f"Имя{number}",
+                    last_name=f"Фамилия{number}",
+                    password=password,
+                    date_joined=now,
+                )
+                for number in range(count)
+            ),
+        )
+        self.reset_sequences(User)
+        return list(range(first_id, first_id + count))
+
+    def create_recipes(self, count, user_ids, user_weights):
+        image = default_storage.save(
+            PLACEHOLDER_IMAGE, ContentFile(PLACEHOLDER_PNG)
+        )
+        image_variants = make_variants(
+            Recipe(image=image).image, RECIPE_IMAGE_VARIANTS
+        )
+        first_id = self.next_id(Recipe)
+        now = timezone.now()
+        self.written = 0
+        for chunk_start in range(0, count, self.writer.batch_size):
+            recipes, recipe_ingredients, recipe_tags = [], [], []
+            for number in range(
+                chunk_start, min(count, chunk_start + self.writer.batch_size)
+            ):
+                recipe_id = first_id + number
+                ingredients = self.sample(
+                    self.ingredients,
+                    self.ingredient_weights,
+                    self.random.randint(*INGREDIENTS_PER_RECIPE),
+                )
+                recipe_ingredients.extend(
+                    RecipeIngredients(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=self.random.randint(*AMOUNT_RANGE),
+                    )
+                    for ingredient_id, _ in ingredients
+                )
+                tag_ids = self.sample(
+                    self.tag_ids,
+                    self.tag_weights,
+                    self.random.randint(*TAGS_PER_RECIPE),
+                )
+                recipe_tags.extend(
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for tag_id in tag_ids
+                )
+                main_ingredient = ingredients[0][1].capitalize()
+                recipes.append(Recipe(
+                    id=recipe_id,
+                    author_id=self.random.choices(
+                        user_ids, cum_weights=user_weights
+                    )[0],
+                    name=f"{main_ingredient} №{number}"[:NAME_LENGTH],
+                    text="Состав: " + ", ".join(
+                        name for _, name in ingredients
+                    ),
+                    image=image,
+                    image_variants=image_variants,
+                    cooking_time=self.random.randint(*COOKING_TIME_RANGE),
+                    ingredients_count=len(ingredients),
+                    tags_mask=tags_mask(tag_ids),
+                    pub_date=now - PUBLICATION_PERIOD * self.random.random(),
+                ))
+            self.written += self.writer.write(Recipe, recipes)
+            self.written += self.writer.write(
+                RecipeIngredients, recipe_ingredients
+            )
+            self.written += self.writer.write(Recipe.tags.through, recipe_tags)
+        self.reset_sequences(Recipe)
+        recipe_ids = list(range(first_id, first_id + count))
+        self.random.shuffle(recipe_ids)
+        return recipe_ids
+
+    def update_search_vectors(self, recipe_ids):
+        self.written = update_search_vectors(
+            Recipe.objects.filter(pk__range=(min(recipe_ids), max(recipe_ids)))
+        )
+
+    def reset_sequences(self, model):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+
+    def create_pairs(self, model, target_field, total, user_ids, targets,
+                     target_weights):
+        """
+        Связи пользователь → объект: активность пользователей
+        и популярность объектов распределены по степенному закону.
+        """
+
+        per_user = Counter(
+            self.random.choices(
+                user_ids, cum_weights=power_law_weights(
+                    len(user_ids), self.alpha
+                ), k=total
+            )
+        )
+
+        def pairs():
+            for user_id in user_ids:
+                chosen = self.sample(
+                    targets, target_weights, per_user[user_id],
+                    exclude=user_id if model is Follow else None,
+                )
+                for target_id in chosen:
+                    yield model(user_id=user_id, **{target_field: target_id})
+
+        self.written = self.writer.write(model, pairs())
+
+    def sample(self, population, cum_weights, count, exclude=None):
+        """До count различных элементов с учетом популярности."""
+
+        count = min(count, len(population) - (exclude is not None))
+        chosen = {}
+        while len(chosen) < count:
+            needed = count - len(chosen)
+            candidates = self.random.choices(
+                population, cum_weights=cum_weights, k=needed
+            )
+            if len(set(candidates)) < needed // 2:
+                # Хвост распределения почти недостижим — добираем равномерно.
+                candidates = self.random.sample(
+                    population, min(len(population), count + 1)
+                )
+            for item in candidates:
+                key = item[0] if isinstance(item, tuple) else item
+                if key != exclude:
+                    chosen.setdefault(key, item)
+        return list(chosen.values())[:count]
@@ -0,0 +1,62 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from recipes.images import IMAGE_FIELDS, make_variants
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    """Команда для создания вариантов уже загруженных изображений."""
+
+    help = (
+        "Создает уменьшенные копии фото рецептов и аватаров в WebP и JPEG "
+        "для записей, у которых их еще нет"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать варианты для всех изображений",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for model, field, variants_field, sizes in IMAGE_FIELDS:
+            queryset = model.objects.exclude(**{field: ""}).exclude(
+                **{f"{field}__isnull": True}
+            )
+            if not options["force"]:
+                queryset = queryset.filter(**{variants_field: {}})
+            # Один файл может принадлежать многим записям.
+            created = {}
+            failed = set()
+            batch = []
+            updated = 0
+            for obj in queryset.only("pk", field).iterator():
+                file = getattr(obj, field)
+                if file.name in failed:
+                    continue
+                if file.name not in created:
+                    try:
+                        created[file.name] = make_variants(file, sizes)
+                    except OSError as error:
+                        failed.add(file.name)
+                        self.stderr.write(f"{file.name}: {error}")
+                        continue
+                setattr(obj, variants_field, created[file.name])
+                batch.append(obj)
+                if len(batch) >= options["batch_size"]:
+                    updated += self.save(model, batch, variants_field)
+                    batch = []
+            updated += self.save(model, batch, variants_field)
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: обновлено {updated}, "
+                f"обработано файлов {len(created)}, ошибок {len(failed)}"
+            )
+        call_command("reconcile_media_files", stdout=self.stdout)
+
+    def save(self, model, objects, variants_field):
+        model.objects.bulk_update(objects, [variants_field])
+        return len(objects)
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.shopping_cart import BATCH_SIZE, calculate_totals
+from recipes.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    """Команда для пересчета итогов списков покупок."""
+
+    help = (
+        "Пересчитывает таблицу итогов списков покупок по рецептам "
+        "в корзинах или, с --verify, только проверяет ее"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Только сравнить таблицу с пересчитанными итогами",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            return self.verify()
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.all().delete()
+            ShoppingCartIngredient.objects.bulk_create(
+                (
+                    ShoppingCartIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for user_id, ingredient_id, amount in calculate_totals()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Итоги списков покупок пересчитаны: "
+            f"{ShoppingCartIngredient.objects.count()} строк"
+        ))
+
+    def verify(self):
+        expected = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in calculate_totals().iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in (
+                ShoppingCartIngredient.objects.values_list(
+                    "user_id", "ingredient_id", "amount"
+                ).iterator()
+            )
+        }
+        drift = sorted(
+            (*key, actual.get(key), expected.get(key))
+            for key in expected.keys() | actual.keys()
+            if actual.get(key) != expected.get(key)
+        )
+        for user_id, ingredient_id, stored, calculated in drift:
+            self.stdout.write(
+                f"user={user_id} ingredient={ingredient_id}: "
+                f"в таблице {stored}, должно быть {calculated}"
+            )
+        if drift:
+            raise CommandError(
+                f"Расхождений в итогах списков покупок: {len(drift)}"
+            )
+        self.stdout.write(self.style.SUCCESS("Расхождений не найдено"))
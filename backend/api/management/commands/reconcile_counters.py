@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import BULK_COUNTERS, COUNTERS, actual_count
+
+
+class Command(BaseCommand):
+    """Команда для сверки денормализованных счетчиков."""
+
+    help = (
+        "Сверяет счетчики избранного, списков покупок, рецептов, "
+        "подписок и продуктов рецептов с фактическими данными "
+        "и исправляет расхождения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать расхождения, ничего не исправляя",
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for model, field, related_model, foreign_key in (
+            *COUNTERS, *BULK_COUNTERS
+        ):
+            actual = actual_count(related_model, foreign_key)
+            drifted = list(
+                model.objects.annotate(actual=actual)
+                .exclude(**{field: F("actual")})
+                .values_list("pk", flat=True)
+            )
+            if drifted and not options["dry_run"]:
+                model.objects.filter(pk__in=drifted).update(**{field: actual})
+            self.stdout.write(
+                f"{model.__name__}.{field}: расхождений {len(drifted)}"
+            )
@@ -0,0 +1,92 @@
+import posixpath
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.images import IMAGE_FIELDS
+from recipes.media import count_references, delete_unused
+from recipes.models import MediaFile
+
+
+class Command(BaseCommand):
+    """Команда для сверки счетчиков ссылок на медиафайлы."""
+
+    help = (
+        "Пересчитывает ссылки на фото рецептов, аватары и их варианты "
+        "и удаляет файлы, на которые никто не ссылается"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать расхождения, ничего не исправляя",
+        )
+        parser.add_argument(
+            "--delete-untracked",
+            action="store_true",
+            help=(
+                "Удалить файлы в каталогах загрузки, "
+                "которых нет в учете ссылок"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        actual = count_references()
+        with transaction.atomic():
+            stored = dict(
+                MediaFile.objects.select_for_update().values_list(
+                    "name", "references"
+                )
+            )
+            drifted = {
+                name: actual.get(name, 0)
+                for name in stored.keys() | actual.keys()
+                if stored.get(name) != actual.get(name, 0)
+            }
+            if drifted and not options["dry_run"]:
+                MediaFile.objects.bulk_create(
+                    [
+                        MediaFile(name=name)
+                        for name in drifted.keys() - stored.keys()
+                    ],
+                    batch_size=1000,
+                )
+                for name, references in drifted.items():
+                    MediaFile.objects.filter(name=name).update(
+                        references=references
+                    )
+        self.stdout.write(f"Счетчики ссылок: расхождений {len(drifted)}")
+        if not options["dry_run"]:
+            deleted = delete_unused(
+                [name for name in stored if not actual.get(name)]
+            )
+            self.stdout.write(f"Удалено файлов без ссылок: {len(deleted)}")
+        if options["delete_untracked"]:
+            untracked = self.find_untracked(actual.keys() | stored.keys())
+            for name in untracked:
+                if not options["dry_run"]:
+                    default_storage.delete(name)
+            self.stdout.write(f"Файлов вне учета: {len(untracked)}")
+
+    def find_untracked(self, tracked):
+        untracked = []
+        directories = [
+            model._meta.get_field(field).upload_to.rstrip("/")
+            for model, field, _, _ in IMAGE_FIELDS
+        ]
+        while directories:
+            directory = directories.pop()
+            if not default_storage.exists(directory):
+                continue
+            subdirectories, files = default_storage.listdir(directory)
+            directories.extend(
+                posixpath.join(directory, name) for name in subdirectories
+            )
+            untracked.extend(
+                name
+                for name in (posixpath.join(directory, file) for file in files)
+                if name not in tracked
+            )
+        return untracked
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.response_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    """Команда для просмотра счетчиков кэша ответов."""
+
+    help = (
+        "Показывает число попаданий и промахов кэша ответов "
+        "анонимным пользователям"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Обнулить счетчики после вывода",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats["hits"] + stats["misses"]
+        self.stdout.write(
+            f"Попаданий {stats['hits']}, промахов {stats['misses']}, "
+            f"доля попаданий {stats['hits'] / total if total else 0:.1%}"
+        )
+        if options["reset"]:
+            reset_stats()
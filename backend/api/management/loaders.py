@@ -0,0 +1,232 @@
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from api.reference import bump_version
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = " \t\r\n,"
+
+
+def read_json(file, chunk_size=CHUNK_SIZE):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in JSON_SEPARATORS:
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Ожидается JSON-массив")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield record
+                continue
+        elif eof:
+            raise ValueError("JSON-массив не закрыт")
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def read_csv(file, fields):
+    """Читает CSV без заголовка, колонки идут в порядке fields."""
+
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, (value.strip() for value in row)))
+
+
+@dataclass
+class LoadStats:
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"Прочитано {self.read}, добавлено {self.inserted}, "
+            f"обновлено {self.updated}, пропущено {self.skipped} "
+            f"за {self.elapsed:.3f} с ({self.rows_per_second:.0f} строк/с)"
+        )
+
+
+class CatalogLoader:
+    """
+    Идемпотентная пакетная загрузка справочника.
+    Дубликаты отсеиваются в памяти по уникальным ключам модели,
+    новые строки пишутся bulk_create(ignore_conflicts=True).
+    В режиме update строки, найденные по первому уникальному ключу,
+    обновляются bulk_update.
+    """
+
+    def __init__(self, model, fields, unique_fields, batch_size=BATCH_SIZE,
+                 update=False):
+        self.model = model
+        self.fields = fields
+        self.unique_fields = unique_fields
+        self.batch_size = batch_size
+        self.update = update
+        self.update_fields = [
+            field for field in fields if field not in unique_fields[0]
+        ]
+
+    def key(self, record, fields):
+        return tuple(record[field] for field in fields)
+
+    def load_existing(self):
+        self.existing = {
+            self.key(row, self.unique_fields[0]): row
+            for row in self.model.objects.values("pk", *self.fields)
+        }
+        self.seen = [
+            {self.key(row, fields) for row in self.existing.values()}
+            for fields in self.unique_fields
+        ]
+
+    def load(self, records):
+        stats = LoadStats()
+        start = time.perf_counter()
+        with transaction.atomic():
+            self.load_existing()
+            count = self.model.objects.count()
+            queued = 0
+            to_create, to_update = [], []
+            for number, record in enumerate(records, 1):
+                stats.read += 1
+                try:
+                    record = {field: record[field] for field in self.fields}
+                except KeyError as error:
+                    raise CommandError(
+                        f"Запись {number}: нет поля {error}"
+                    ) from error
+                if self.update and self.update_changed(record, to_update):
+                    continue
+                keys = [
+                    self.key(record, fields) for fields in self.unique_fields
+                ]
+                if any(key in seen for key, seen in zip(keys, self.seen)):
+                    stats.skipped += 1
+                    continue
+                for key, seen in zip(keys, self.seen):
+                    seen.add(key)
+                to_create.append(self.model(**record))
+                queued += 1
+                if len(to_create) >= self.batch_size:
+                    self.create(to_create)
+                    to_create = []
+            self.create(to_create)
+            stats.inserted = self.model.objects.count() - count
+            stats.skipped += queued - stats.inserted
+            if to_update:
+                stats.updated = len(to_update)
+                self.model.objects.bulk_update(
+                    to_update, self.update_fields, batch_size=self.batch_size
+                )
+        stats.elapsed = time.perf_counter() - start
+        return stats
+
+    def update_changed(self, record, to_update):
+        """Ставит в очередь обновление измененной существующей строки."""
+
+        row = self.existing.get(self.key(record, self.unique_fields[0]))
+        if row is None or not self.update_fields:
+            return False
+        if all(row[field] == record[field] for field in self.update_fields):
+            return False
+        row.update(record)
+        to_update.append(self.model(**row))
+        return True
+
+    def create(self, objects):
+        """
+        Строки, конфликтующие с записанными параллельно, пропускаются
+        базой молча, поэтому добавленные считаются по разнице count().
+        """
+
+        self.model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
+
+
+class LoadCatalogCommand(BaseCommand):
+    """Базовая команда загрузки справочника из JSON или CSV."""
+
+    model = None
+    fields = ()
+    unique_fields = ()
+    default_filename = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "filename", default=self.default_filename, nargs="?", type=str
+        )
+        parser.add_argument(
+            "--batch-size",
+            default=BATCH_SIZE,
+            type=int,
+            help="Размер пакета для INSERT и UPDATE",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Обновлять существующие записи, найденные по ключу",
+        )
+
+    def read_records(self, file, filename):
+        if filename.endswith(".csv"):
+            return read_csv(file, self.fields)
+        return read_json(file)
+
+    def handle(self, *args, **options):
+        filename = options["filename"]
+        loader = CatalogLoader(
+            self.model,
+            self.fields,
+            self.unique_fields,
+            batch_size=options["batch_size"],
+            update=options["update"],
+        )
+        try:
+            with open(
+                os.path.join(settings.CSV_FILES_DIR, filename),
+                "r",
+                encoding="utf-8",
+            ) as file:
+                stats = loader.load(self.read_records(file, filename))
+        except FileNotFoundError:
+            raise CommandError(_("The file is missing in the data folder"))
+        except ValueError as error:
+            raise CommandError(error)
+        if stats.inserted or stats.updated:
+            bump_version()
+        self.stdout.write(str(stats))
@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Value
+
+from recipes.models import Favorite, Follow, ShoppingCart
+from .cache import bump_cache_versions, get_cache_version
+from .constants import (
+    MEMBERSHIP_CACHE_KEY, MEMBERSHIP_CACHE_TIMEOUT, MEMBERSHIP_VERSION
+)
+
+
+@dataclass(frozen=True)
+class Membership:
+    """Id рецептов в избранном и корзине пользователя и id его авторов."""
+
+    favorites: frozenset = frozenset()
+    shopping_cart: frozenset = frozenset()
+    following: frozenset = frozenset()
+
+
+# Поле Membership: (модель связи, поле с id).
+MEMBERSHIP_SOURCES = {
+    "favorites": (Favorite, "recipe_id"),
+    "shopping_cart": (ShoppingCart, "recipe_id"),
+    "following": (Follow, "subscribing_id"),
+}
+
+
+def load_membership(user):
+    """Все три множества одним запросом UNION ALL."""
+
+    rows = {field: set() for field in MEMBERSHIP_SOURCES}
+    queries = [
+        model.objects.filter(user=user)
+        .annotate(source=Value(field, output_field=CharField()))
+        .values_list("source", target)
+        .order_by()
+        for field, (model, target) in MEMBERSHIP_SOURCES.items()
+    ]
+    for field, pk in queries[0].union(*queries[1:], all=True):
+        rows[field].add(pk)
+    return Membership(**{
+        field: frozenset(pks) for field, pks in rows.items()
+    })
+
+
+def get_membership(request):
+    """
+    Множества текущего пользователя: один раз за запрос,
+    из кэша под версией, которую сдвигают переключатели.
+    """
+
+    membership = getattr(request, "_membership", None)
+    if membership is not None:
+        return membership
+    user = request.user
+    if not user.is_authenticated:
+        membership = Membership()
+    else:
+        key = MEMBERSHIP_CACHE_KEY.format(
+            user.pk, get_cache_version(MEMBERSHIP_VERSION.format(user.pk))
+        )
+        membership = cache.get(key)
+        if membership is None:
+            membership = load_membership(user)
+            cache.set(key, membership, MEMBERSHIP_CACHE_TIMEOUT)
+    request._membership = membership
+    return membership
+
+
+def invalidate_membership(request):
+    """
+    Сбрасывает множества пользователя после коммита: раньше
+    параллельный запрос закэшировал бы старое состояние под новой версией.
+    """
+
+    request._membership = None
+    user_id = request.user.pk
+    transaction.on_commit(
+        lambda: bump_cache_versions(MEMBERSHIP_VERSION.format(user_id))
+    )
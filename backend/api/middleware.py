@@ -0,0 +1,69 @@
+import json
+import logging
+
+from django.conf import settings
+
+from .constants import QUERY_BUDGETS
+from .queries import QueryCollector, collect_queries
+
+logger = logging.getLogger("api.queries")
+
+
+class QueryCountMiddleware:
+    """
+    Считает SQL-запросы и время работы с базой данных для каждого запроса,
+    отмечает вероятные N+1 и превышение бюджета маршрута.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        with collect_queries(collector):
+            response = self.get_response(request)
+        match = request.resolver_match
+        stats = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+        }
+        response.query_stats = stats
+        if response.streaming:
+            stats.update(collector.as_dict())
+            response.streaming_content = self.collect_streaming(
+                response.streaming_content, collector, stats
+            )
+        else:
+            self.report(collector, stats)
+        if getattr(settings, "QUERY_COUNT_HEADERS", settings.DEBUG):
+            response["X-DB-Queries"] = stats["queries"]
+            response["X-DB-Time"] = stats["db_time_ms"]
+            response["X-DB-N-Plus-One"] = len(stats["n_plus_one"])
+        return response
+
+    def collect_streaming(self, content, collector, stats):
+        """Досчитывает запросы, выполненные при отдаче потокового ответа."""
+
+        chunks = iter(content)
+        while True:
+            with collect_queries(collector):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+        self.report(collector, stats)
+
+    def report(self, collector, stats):
+        stats.update(collector.as_dict())
+        stats["budget"] = budget = QUERY_BUDGETS.get(
+            (stats["view"], stats["method"])
+        )
+        over_budget = budget is not None and stats["queries"] > budget
+        logger.log(
+            logging.WARNING
+            if over_budget or stats["n_plus_one"]
+            else logging.INFO,
+            json.dumps(stats, ensure_ascii=False),
+        )
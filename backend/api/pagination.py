@@ -1,6 +1,18 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
 
 from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination, PageNumberPagination, _positive_int
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .constants import INVALID_CURSOR
 
 PAGE_SIZE = settings.REST_FRAMEWORK["PAGE_SIZE"]
 
@@ -11,3 +23,115 @@ class CustomPagination(PageNumberPagination):
     page_size = PAGE_SIZE
     page_size_query_param = "limit"
     max_page_size = PAGE_SIZE
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по ключу (pub_date, id).
+    Стоимость страницы не зависит от ее глубины: вместо OFFSET и COUNT(*)
+    выборка начинается сразу с позиции, закодированной в курсоре.
+    """
+
+    page_size = PAGE_SIZE
+    page_size_query_param = "limit"
+    max_page_size = PAGE_SIZE
+    cursor_query_param = "cursor"
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            pub_date = parse_datetime(cursor["pub_date"])
+            pk = cursor["id"]
+            reverse = bool(cursor["reverse"])
+        except (binascii.Error, KeyError, TypeError, ValueError):
+            raise NotFound(INVALID_CURSOR)
+        if pub_date is None or type(pk) is not int:
+            raise NotFound(INVALID_CURSOR)
+        return pub_date, pk, reverse
+
+    def encode_cursor(self, recipe, reverse):
+        cursor = json.dumps({
+            "pub_date": recipe.pub_date.isoformat(),
+            "id": recipe.id,
+            "reverse": reverse,
+        })
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            base64.urlsafe_b64encode(cursor.encode()).decode(),
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor) and cursor[2]
+        if cursor:
+            pub_date, pk, _ = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+                )
+        queryset = queryset.order_by(
+            *(("pub_date", "id") if reverse else ("-pub_date", "-id"))
+        )
+        page = list(queryset[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": (
+                self.encode_cursor(self.page[-1], reverse=False)
+                if self.has_next and self.page else None
+            ),
+            "previous": (
+                self.encode_cursor(self.page[0], reverse=True)
+                if self.has_previous and self.page else None
+            ),
+            "results": data,
+        })
+
+
+class RecipePagination(CustomPagination):
+    """
+    Постраничная пагинация рецептов.
+    Параметр cursor (для первой страницы — пустой) включает
+    курсорный режим KeysetPagination.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
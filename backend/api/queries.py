@@ -0,0 +1,105 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Нормализует SQL-запрос, заменяя литералы и плейсхолдеры на «?»."""
+
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql.replace("%s", "?"))
+    sql = PLACEHOLDER_LIST.sub("(...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryCollector:
+    """Обертка для execute, собирающая количество и время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold=None):
+        """Запросы, повторенные больше threshold раз — вероятный N+1."""
+
+        threshold = threshold or settings.N_PLUS_ONE_THRESHOLD
+        return {
+            sql: count
+            for sql, count in self.fingerprints.items()
+            if count > threshold
+        }
+
+    def as_dict(self):
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.duration * 1000, 2),
+            "n_plus_one": self.repeated(),
+        }
+
+
+@contextmanager
+def collect_queries(collector=None):
+    """Считает запросы ко всем базам данных внутри блока with."""
+
+    collector = collector or QueryCollector()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(collector))
+        yield collector
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """
+    Проверяет, что блок выполняет не больше limit запросов
+    и не содержит повторяющихся запросов.
+    """
+
+    with collect_queries() as collector:
+        yield collector
+    assert collector.count <= limit, (
+        f"Выполнено {collector.count} SQL-запросов, допустимо {limit}"
+    )
+    assert not collector.repeated(), (
+        f"Вероятный N+1: {collector.repeated()}"
+    )
+
+
+def assert_query_budget(response):
+    """
+    Сверяет статистику, сохраненную QueryCountMiddleware в ответе,
+    с бюджетом маршрута и метода из QUERY_BUDGETS.
+    """
+
+    stats = response.query_stats
+    route = f"{stats['method']} {stats['view']}"
+    assert stats["budget"] is not None, (
+        f"Для {route} не задан бюджет запросов"
+    )
+    assert stats["queries"] <= stats["budget"], (
+        f"{route}: {stats['queries']} SQL-запросов, "
+        f"допустимо {stats['budget']}"
+    )
+    assert not stats["n_plus_one"], (
+        f"{route}: вероятный N+1 {stats['n_plus_one']}"
+    )
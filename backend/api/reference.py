@@ -0,0 +1,83 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from recipes.models import Ingredient, Tag
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_version():
+    """Возвращает штамп версии справочников, общий для всех воркеров."""
+
+    try:
+        return os.stat(settings.REFERENCE_DATA_STAMP).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump_version():
+    """Сдвигает штамп версии — воркеры перечитают справочники."""
+
+    now = time.time_ns()
+    with open(settings.REFERENCE_DATA_STAMP, "a"):
+        os.utime(settings.REFERENCE_DATA_STAMP, ns=(now, now))
+
+
+class ReferenceSnapshot:
+    """Снимок ингредиентов и тегов в памяти процесса."""
+
+    def __init__(self, version):
+        self.version = version
+        ingredients = list(
+            Ingredient.objects.values("id", "name", "measurement_unit")
+        )
+        tags = list(Tag.objects.values("id", "name", "slug"))
+        self.ingredients = {
+            ingredient["id"]: ingredient for ingredient in ingredients
+        }
+        self.ingredients_by_name = sorted(
+            ingredients, key=lambda ingredient: ingredient["name"]
+        )
+        self.ingredient_names = [
+            ingredient["name"] for ingredient in self.ingredients_by_name
+        ]
+        self.ingredients_json = json.dumps(
+            ingredients, ensure_ascii=False
+        ).encode()
+        self.tags = {tag["id"]: tag for tag in tags}
+        self.tags_by_slug = {tag["slug"]: tag for tag in tags}
+        self.tags_json = json.dumps(tags, ensure_ascii=False).encode()
+
+    def ingredients_startswith(self, prefix):
+        """Ингредиенты, название которых начинается с prefix."""
+
+        found = []
+        index = bisect.bisect_left(self.ingredient_names, prefix)
+        while (
+            index < len(self.ingredient_names)
+            and self.ingredient_names[index].startswith(prefix)
+        ):
+            found.append(self.ingredients_by_name[index])
+            index += 1
+        return found
+
+
+def get_snapshot():
+    """
+    Возвращает актуальный снимок справочников,
+    перестраивая его после изменения штампа версии.
+    """
+
+    global _snapshot
+    version = get_version()
+    if _snapshot is None or _snapshot.version != version:
+        with _lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = ReferenceSnapshot(version)
+    return _snapshot
@@ -0,0 +1,76 @@
+import json
+from hashlib import md5
+
+from django.core.cache import cache
+
+from .cache import get_cache_versions
+from .constants import (
+    RESPONSE_CACHE_KEY, RESPONSE_CACHE_QUERY_PARAMS, RESPONSE_CACHE_STATS_KEY
+)
+from .reference import get_version
+
+STATS = ("hits", "misses")
+
+
+def response_cache_key(request, kind):
+    """
+    Ключ ответа по нормализованной строке запроса или None,
+    если в запросе есть параметры, которые не кэшируются.
+    """
+
+    params = request.query_params
+    if request.user.is_authenticated or (
+        set(params) - set(RESPONSE_CACHE_QUERY_PARAMS)
+    ):
+        return None
+    normalized = [
+        (name, sorted(set(params.getlist(name))))
+        for name in RESPONSE_CACHE_QUERY_PARAMS
+        if name in params
+    ]
+    # Версия справочников: названия тегов и продуктов входят в ответ.
+    raw = json.dumps(
+        [request.get_host(), request.path, normalized, get_version()]
+    )
+    return RESPONSE_CACHE_KEY.format(kind, md5(raw.encode()).hexdigest())
+
+
+def count(event):
+    key = RESPONSE_CACHE_STATS_KEY.format(event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_stats():
+    stored = cache.get_many(
+        [RESPONSE_CACHE_STATS_KEY.format(event) for event in STATS]
+    )
+    return {
+        event: stored.get(RESPONSE_CACHE_STATS_KEY.format(event), 0)
+        for event in STATS
+    }
+
+
+def reset_stats():
+    cache.delete_many(
+        [RESPONSE_CACHE_STATS_KEY.format(event) for event in STATS]
+    )
+
+
+def get_cached_response(key):
+    """Данные ответа, если ни одна из их версий не сдвинута."""
+
+    entry = cache.get(key)
+    if entry is not None and (
+        get_cache_versions(*entry["versions"]) == entry["versions"]
+    ):
+        count("hits")
+        return entry["data"]
+    count("misses")
+    return None
+
+
+def set_cached_response(key, data, versions, timeout):
+    cache.set(key, {"versions": versions, "data": data}, timeout)
@@ -1,18 +1,23 @@
 from drf_extra_fields.fields import Base64ImageField
+from django.core.files.storage import default_storage
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
 
-from recipes.models import (
-    Follow, Ingredient, Recipe, RecipeIngredients, Tag, User
-)
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag, User
 from .constants import (
+    IMAGE_VARIANT_FORMATS,
     ITEMS_NOT_REPEAT,
     MIN_VALUE_AMOUNT,
     MIN_VALUE_COOKING_TIME,
     NOT_EMPTY_FIELD,
     REQUIRED_FIELD,
 )
+from .membership import get_membership
+from .shopping_cart import batch_totals, update_recipe_in_totals
+from .utils import invalidate_shopping_lists, schedule_similar_recipes_update
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -23,12 +28,64 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+DOES_NOT_EXIST = PrimaryKeyRelatedField.default_error_messages[
+    "does_not_exist"
+]
+
+
+def resolve_primary_keys(queryset, pks):
+    """
+    Загружает объекты по списку первичных ключей одним запросом.
+    Возвращает словарь {pk: объект} и ошибки {позиция: [сообщение]}.
+    """
+
+    objects = queryset.in_bulk(set(pks))
+    errors = {
+        index: [DOES_NOT_EXIST.format(pk_value=pk)]
+        for index, pk in enumerate(pks)
+        if pk not in objects
+    }
+    return objects, errors
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """Список первичных ключей, разрешаемый одним запросом IN (...)."""
+
+    child = serializers.IntegerField()
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            pks = super().to_internal_value(data)
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError(self._flatten(error.detail))
+        objects, errors = resolve_primary_keys(self.queryset, pks)
+        if errors:
+            raise serializers.ValidationError(self._flatten(errors))
+        return [objects[pk] for pk in pks]
+
+    @staticmethod
+    def _flatten(errors):
+        """Ошибки по позициям сводятся в плоский список, как у many=True."""
+        if not isinstance(errors, dict):
+            return errors
+        return [
+            message
+            for index in sorted(errors)
+            for message in errors[index]
+        ]
+
+
 class RecipeIngredientCreateSerializer(serializers.Serializer):
-    """Сериализатор для создания ингредиентов в рецепте."""
+    """
+    Сериализатор для создания ингредиентов в рецепте.
+    Ингредиенты по id загружает RecipeCreateSerializer сразу для всего списка.
+    """
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source="ingredient"
-    )
+    id = serializers.IntegerField(source="ingredient")
     amount = serializers.IntegerField(min_value=MIN_VALUE_AMOUNT)
 
 
@@ -40,22 +97,53 @@ class TagSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """
+    Варианты изображения в виде srcset для каждого формата:
+    {"webp": "<url> 80w, <url> 480w", "jpeg": ...}.
+    """
+
+    def to_representation(self, variants):
+        request = self.context.get("request")
+        srcset = {}
+        for variant in sorted(variants.values(), key=lambda v: v["width"]):
+            for extension in IMAGE_VARIANT_FORMATS:
+                if extension not in variant:
+                    continue
+                url = default_storage.url(variant[extension])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                srcset.setdefault(extension, {}).setdefault(
+                    variant["width"], url
+                )
+        return {
+            extension: ", ".join(
+                f"{url} {width}w" for width, url in urls.items()
+            )
+            for extension, urls in srcset.items()
+        }
+
+
 class CustomUserSerializer(DjoserUserSerializer):
     """Сериализатор для модели User."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_srcset = ImageSrcsetField(source="avatar_variants")
 
     class Meta(DjoserUserSerializer.Meta):
-        fields = (*DjoserUserSerializer.Meta.fields, "avatar", "is_subscribed")
+        fields = (
+            *DjoserUserSerializer.Meta.fields,
+            "avatar",
+            "avatar_srcset",
+            "is_subscribed",
+        )
 
     def get_is_subscribed(self, subscribing):
+        if hasattr(subscribing, "is_subscribed"):
+            return subscribing.is_subscribed
         request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and Follow.objects.filter(
-                user=request.user, subscribing=subscribing
-            ).exists()
+        return bool(request) and (
+            subscribing.pk in get_membership(request).following
         )
 
 
@@ -96,6 +184,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_srcset = ImageSrcsetField(source="image_variants")
 
     class Meta:
         model = Recipe
@@ -104,6 +193,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "author",
             "name",
             "image",
+            "image_srcset",
             "text",
             "ingredients",
             "tags",
@@ -112,20 +202,17 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
         ]
 
-    def _get_is_related(self, recipe, related_name):
+    def _get_is_related(self, recipe, field):
         request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and (getattr
-                 (recipe, related_name).filter(user=request.user).exists())
+        return bool(request) and (
+            recipe.pk in getattr(get_membership(request), field)
         )
 
     def get_is_favorited(self, recipe):
         return self._get_is_related(recipe, "favorites")
 
     def get_is_in_shopping_cart(self, recipe):
-        return self._get_is_related(recipe, "shoppingcarts")
+        return self._get_is_related(recipe, "shopping_cart")
 
     def validate_pk(self, value):
         if not Recipe.objects.filter(pk=value).exists():
@@ -134,10 +221,40 @@ class RecipeSerializer(serializers.ModelSerializer):
         return value
 
 
+class RecipeCoverageSerializer(RecipeSerializer):
+    """
+    Рецепт с числом продуктов, которые уже есть у пользователя,
+    и списком недостающих.
+    """
+
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = [
+            *RecipeSerializer.Meta.fields,
+            "ingredients_count",
+            "matched_count",
+            "missing_ingredients",
+        ]
+
+    def get_missing_ingredients(self, recipe):
+        available = self.context["available_ingredients"]
+        return RecipeIngredientSerializer(
+            [
+                recipe_ingredient
+                for recipe_ingredient in recipe.recipe_ingredients.all()
+                if recipe_ingredient.ingredient_id not in available
+            ],
+            many=True,
+        ).data
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и обновления рецептов."""
 
     ingredients = RecipeIngredientCreateSerializer(many=True, required=True)
+    tags = PrimaryKeyListField(queryset=Tag.objects.all())
     image = Base64ImageField(required=False)
     cooking_time = serializers.IntegerField(min_value=MIN_VALUE_COOKING_TIME)
 
@@ -147,6 +264,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         for field in ["image", "ingredients", "tags"]:
+            if self.partial and field not in data:
+                continue
             if not data.get(field):
                 if field == "image" and self.instance:
                     continue
@@ -168,6 +287,22 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
 
     def validate_ingredients(self, recipe_ingredient_data):
+        ingredients, errors = resolve_primary_keys(
+            Ingredient.objects.all(),
+            [
+                ingredient_data["ingredient"]
+                for ingredient_data in recipe_ingredient_data
+            ],
+        )
+        if errors:
+            raise serializers.ValidationError([
+                {"id": errors[index]} if index in errors else {}
+                for index in range(len(recipe_ingredient_data))
+            ])
+        for ingredient_data in recipe_ingredient_data:
+            ingredient_data["ingredient"] = ingredients[
+                ingredient_data["ingredient"]
+            ]
         self._validate_unique(
             [
                 ingredient_data["ingredient"]
@@ -198,33 +333,117 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def create(self, recipe_data):
         recipe_ingredient_data = recipe_data.pop("ingredients")
         tag_data = recipe_data.pop("tags")
-        return self._set_recipe_ingredients_and_tags(
+        recipe_data["ingredients_count"] = len(recipe_ingredient_data)
+        recipe = self._set_recipe_ingredients_and_tags(
             recipe=super().create(recipe_data),
             recipe_ingredient_data=recipe_ingredient_data,
             tag_data=tag_data,
         )
+        schedule_similar_recipes_update(recipe)
+        return recipe
 
+    def _update_recipe_ingredients(self, recipe, recipe_ingredient_data):
+        """
+        Сравнивает новый состав рецепта с текущим: меняет только
+        изменившиеся количества, удаляет убранные и добавляет новые строки.
+        Возвращает True, если состав изменился.
+        """
+
+        rows = {
+            row.ingredient_id: row
+            for row in RecipeIngredients.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: row.amount for ingredient_id, row in rows.items()
+        }
+        new_amounts = {
+            ingredient_data["ingredient"].id: ingredient_data["amount"]
+            for ingredient_data in recipe_ingredient_data
+        }
+        if new_amounts == old_amounts:
+            return False
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            row = rows.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        with batch_totals(recipe_ids=[recipe.pk]):
+            RecipeIngredients.objects.bulk_update(changed, ["amount"])
+            RecipeIngredients.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=old_amounts.keys() - new_amounts.keys(),
+            ).delete()
+            RecipeIngredients.objects.bulk_create(
+                RecipeIngredients(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+                for ingredient_id, amount in new_amounts.items()
+                if ingredient_id not in rows
+            )
+        update_recipe_in_totals(recipe, old_amounts, new_amounts)
+        return True
+
+    @transaction.atomic
     def update(self, old_recipe, new_recipe_data):
-        recipe_ingredient_data = new_recipe_data.pop("ingredients")
-        tag_data = new_recipe_data.pop("tags")
-        old_recipe.ingredients.clear()
-        self._set_recipe_ingredients_and_tags(
-            recipe=old_recipe,
-            recipe_ingredient_data=recipe_ingredient_data,
-            tag_data=tag_data,
+        recipe_ingredient_data = new_recipe_data.pop("ingredients", None)
+        tag_data = new_recipe_data.pop("tags", None)
+        tags_changed = tag_data is not None and {
+            tag.id for tag in tag_data
+        } != set(old_recipe.tags.values_list("id", flat=True))
+        if tags_changed:
+            # set() сам сравнивает теги и пишет только разницу.
+            old_recipe.tags.set(tag_data)
+        ingredients_changed = (
+            recipe_ingredient_data is not None
+            and self._update_recipe_ingredients(
+                old_recipe, recipe_ingredient_data
+            )
         )
+        if ingredients_changed:
+            new_recipe_data["ingredients_count"] = len(recipe_ingredient_data)
+        if ingredients_changed or tags_changed:
+            schedule_similar_recipes_update(old_recipe)
+        if ingredients_changed or new_recipe_data.get(
+            "name", old_recipe.name
+        ) != old_recipe.name:
+            transaction.on_commit(
+                lambda: invalidate_shopping_lists(old_recipe)
+            )
         return super().update(old_recipe, new_recipe_data)
 
     def to_representation(self, recipe):
+        prefetch_related_objects(
+            [recipe],
+            "tags",
+            Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredients.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
         return RecipeSerializer(recipe, context=self.context).data
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения краткой информации о рецепте."""
 
+    image_srcset = ImageSrcsetField(source="image_variants")
+
     class Meta:
         model = Recipe
-        fields = "id", "name", "image", "cooking_time"
+        fields = "id", "name", "image", "image_srcset", "cooking_time"
+        read_only_fields = fields
+
+
+class SimilarRecipeSerializer(RecipeListSerializer):
+    """Сериализатор для похожего рецепта со степенью сходства."""
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = (*RecipeListSerializer.Meta.fields, "similarity")
         read_only_fields = fields
 
 
@@ -232,7 +451,6 @@ class FollowSerializer(CustomUserSerializer):
     """Сериализатор для модели Follow."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source="recipes.count")
 
     class Meta(CustomUserSerializer.Meta):
         fields = (
@@ -241,6 +459,10 @@ class FollowSerializer(CustomUserSerializer):
         read_only_fields = fields
 
     def get_recipes(self, author):
+        if hasattr(author, "recipes_preview"):
+            return RecipeListSerializer(
+                author.recipes_preview, many=True, read_only=True
+            ).data
         request = self.context.get("request")
         limit = request.GET.get("recipes_limit")
         if limit is None:
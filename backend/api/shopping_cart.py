@@ -0,0 +1,200 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import (
+    RecipeIngredients, ShoppingCart, ShoppingCartIngredient, User
+)
+
+BATCH_SIZE = 1000
+
+# Рецепты и пользователи, итоги которых пересчитывает пакетно
+# вызывающий код, а не сигналы отдельных строк корзин и состава.
+_batched = threading.local()
+
+
+def batched_ids(kind):
+    if not hasattr(_batched, kind):
+        setattr(_batched, kind, Counter())
+    return getattr(_batched, kind)
+
+
+def get_deletions():
+    if not hasattr(_batched, "deletions"):
+        _batched.deletions = []
+    return _batched.deletions
+
+
+def deleting_ids(kind):
+    """
+    Удаляемые сейчас рецепты или пользователи. Пометка живет, пока
+    ждет своей очереди ее обработчик on_commit: откат транзакции или
+    точки сохранения его отбрасывает, и пометка больше не действует.
+    """
+
+    deletions = get_deletions()
+    if not deletions:
+        return set()
+    pending = {
+        func for _, func in transaction.get_connection().run_on_commit
+    }
+    deletions[:] = [
+        deletion for deletion in deletions if deletion[2] in pending
+    ]
+    return {pk for deletion_kind, pk, _ in deletions if deletion_kind == kind}
+
+
+def is_batched(recipe_id=None, user_id=None):
+    return bool(
+        batched_ids("recipes")[recipe_id]
+        or batched_ids("users")[user_id]
+        or recipe_id in deleting_ids("recipes")
+        or user_id in deleting_ids("users")
+    )
+
+
+def start_delete(kind, pk):
+    """
+    Помечает удаляемый объект до его post_delete. Если удаление
+    упадет, post_delete не придет: пометку снимет коммит или
+    отменит откат транзакции.
+    """
+
+    def finish():
+        finish_delete(kind, pk)
+
+    get_deletions().append((kind, pk, finish))
+    transaction.on_commit(finish)
+
+
+def finish_delete(kind, pk):
+    deletions = get_deletions()
+    for index, deletion in enumerate(deletions):
+        if deletion[:2] == (kind, pk):
+            del deletions[index]
+            return
+
+
+@contextmanager
+def batch_totals(recipe_ids=(), user_ids=()):
+    """Внутри блока сигналы не меняют итоги этих рецептов и пользователей."""
+
+    batched_ids("recipes").update(recipe_ids)
+    batched_ids("users").update(user_ids)
+    try:
+        yield
+    finally:
+        batched_ids("recipes").subtract(recipe_ids)
+        batched_ids("users").subtract(user_ids)
+
+
+def get_recipe_amounts(recipe):
+    """Количество каждого продукта в рецепте: {ingredient_id: amount}."""
+
+    return dict(
+        RecipeIngredients.objects.filter(recipe=recipe).values_list(
+            "ingredient_id", "amount"
+        )
+    )
+
+
+@transaction.atomic
+def apply_shopping_cart_delta(user_ids, delta):
+    """
+    Прибавляет delta ({ingredient_id: amount}) к итогам списков покупок
+    пользователей user_ids, удаляя строки с нулевым количеством.
+    """
+
+    delta = {
+        ingredient_id: amount
+        for ingredient_id, amount in delta.items()
+        if amount
+    }
+    user_ids = list(user_ids)
+    if not delta or not user_ids:
+        return
+    list(
+        User.objects.select_for_update()
+        .filter(pk__in=user_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    existing = {
+        (row.user_id, row.ingredient_id): row
+        for row in ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=delta
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, amount in delta.items():
+            row = existing.get((user_id, ingredient_id))
+            if row is None:
+                if amount > 0:
+                    to_create.append(
+                        ShoppingCartIngredient(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        )
+                    )
+                continue
+            row.amount += amount
+            if row.amount > 0:
+                to_update.append(row)
+            else:
+                to_delete.append(row.pk)
+    ShoppingCartIngredient.objects.bulk_create(
+        to_create, batch_size=BATCH_SIZE
+    )
+    ShoppingCartIngredient.objects.bulk_update(
+        to_update, ["amount"], batch_size=BATCH_SIZE
+    )
+    ShoppingCartIngredient.objects.filter(pk__in=to_delete).delete()
+
+
+def get_cart_user_ids(recipe):
+    return list(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+def add_recipe_to_totals(user_ids, recipe):
+    apply_shopping_cart_delta(user_ids, get_recipe_amounts(recipe))
+
+
+def remove_recipe_from_totals(user_ids, recipe):
+    apply_shopping_cart_delta(
+        user_ids,
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in get_recipe_amounts(recipe).items()
+        },
+    )
+
+
+def update_recipe_in_totals(recipe, old_amounts, new_amounts):
+    """
+    Переносит изменение состава рецепта в итоги всех пользователей,
+    у которых рецепт лежит в списке покупок.
+    """
+
+    delta = Counter(new_amounts)
+    delta.subtract(old_amounts)
+    apply_shopping_cart_delta(get_cart_user_ids(recipe), delta)
+
+
+def calculate_totals():
+    """Итоги списков покупок, посчитанные заново по RecipeIngredients."""
+
+    return (
+        RecipeIngredients.objects.filter(recipe__shoppingcarts__isnull=False)
+        .values_list("recipe__shoppingcarts__user", "ingredient")
+        .annotate(total_amount=Sum("amount"))
+        .order_by()
+    )
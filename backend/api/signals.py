@@ -0,0 +1,249 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    Tag,
+    User,
+)
+from .cache import bump_cache_versions
+from .constants import (
+    AUTHOR_RECIPES_VERSION,
+    AUTHOR_VERSION,
+    FEED_VERSION,
+    RECIPE_VERSION,
+    SHOPPING_CART_VERSION,
+    TAG_RECIPES_VERSION,
+)
+from .reference import bump_version
+from .shopping_cart import (
+    add_recipe_to_totals,
+    apply_shopping_cart_delta,
+    finish_delete,
+    get_cart_user_ids,
+    is_batched,
+    remove_recipe_from_totals,
+    start_delete,
+)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_reference_data(**kwargs):
+    """Сбрасывает снимок справочников после изменения ингредиента или тега."""
+
+    transaction.on_commit(bump_version)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_shopping_list(instance, **kwargs):
+    """Сбрасывает кэш списка покупок пользователя при изменении корзины."""
+
+    transaction.on_commit(
+        lambda: bump_cache_versions(
+            SHOPPING_CART_VERSION.format(instance.user_id)
+        )
+    )
+
+
+# Итоги списков покупок (ShoppingCartIngredient) следуют за корзинами
+# и составом рецептов. Удаляемые рецепты и пользователи пересчитываются
+# одним пакетом в pre_delete, а строки их корзин и состава, удаляемые
+# каскадом, итоги уже не трогают.
+@receiver(pre_delete, sender=Recipe)
+def release_recipe_totals(instance, **kwargs):
+    start_delete("recipes", instance.pk)
+    remove_recipe_from_totals(get_cart_user_ids(instance.pk), instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def release_user_totals(instance, **kwargs):
+    # Итоги самого пользователя удаляются каскадом.
+    start_delete("users", instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def finish_recipe_totals(instance, **kwargs):
+    finish_delete("recipes", instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def finish_user_totals(instance, **kwargs):
+    finish_delete("users", instance.pk)
+
+
+@receiver(post_init, sender=ShoppingCart)
+def remember_cart_row(instance, **kwargs):
+    if "user_id" in instance.__dict__ and "recipe_id" in instance.__dict__:
+        instance._stored_cart = instance.user_id, instance.recipe_id
+
+
+@receiver(post_save, sender=ShoppingCart)
+def update_cart_totals(instance, created, **kwargs):
+    """Переносит добавление рецепта в корзину в итоги списка покупок."""
+
+    stored = None if created else getattr(instance, "_stored_cart", None)
+    current = instance.user_id, instance.recipe_id
+    if created or (stored is not None and stored != current):
+        if stored is not None:
+            remove_recipe_from_totals([stored[0]], stored[1])
+        add_recipe_to_totals([instance.user_id], instance.recipe_id)
+    instance._stored_cart = current
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def release_cart_totals(instance, **kwargs):
+    if not is_batched(instance.recipe_id, instance.user_id):
+        remove_recipe_from_totals([instance.user_id], instance.recipe_id)
+
+
+@receiver(post_init, sender=RecipeIngredients)
+def remember_recipe_ingredient(instance, **kwargs):
+    if "ingredient_id" in instance.__dict__ and "amount" in instance.__dict__:
+        instance._stored_amount = instance.ingredient_id, instance.amount
+
+
+@receiver(post_save, sender=RecipeIngredients)
+def update_recipe_ingredient_totals(instance, created, **kwargs):
+    """Переносит изменение строки состава в итоги списков покупок."""
+
+    stored = None if created else getattr(instance, "_stored_amount", None)
+    instance._stored_amount = instance.ingredient_id, instance.amount
+    if (not created and stored is None) or is_batched(instance.recipe_id):
+        return
+    delta = Counter({instance.ingredient_id: instance.amount})
+    if stored is not None:
+        delta.subtract({stored[0]: stored[1]})
+    if any(delta.values()):
+        apply_shopping_cart_delta(
+            get_cart_user_ids(instance.recipe_id), delta
+        )
+
+
+@receiver(post_delete, sender=RecipeIngredients)
+def release_recipe_ingredient_totals(instance, **kwargs):
+    if not is_batched(instance.recipe_id):
+        apply_shopping_cart_delta(
+            get_cart_user_ids(instance.recipe_id),
+            {instance.ingredient_id: -instance.amount},
+        )
+
+
+@receiver(post_init, sender=Ingredient)
+def remember_ingredient_label(instance, **kwargs):
+    if "name" in instance.__dict__ and (
+        "measurement_unit" in instance.__dict__
+    ):
+        instance._stored_label = instance.name, instance.measurement_unit
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_shopping_lists(instance, created, **kwargs):
+    """Сбрасывает кэш списков покупок с переименованным продуктом."""
+
+    stored = getattr(instance, "_stored_label", None)
+    instance._stored_label = instance.name, instance.measurement_unit
+    if created or stored in (None, instance._stored_label):
+        return
+    bump_on_commit(*(
+        SHOPPING_CART_VERSION.format(user_id)
+        for user_id in ShoppingCartIngredient.objects.filter(
+            ingredient=instance
+        ).values_list("user_id", flat=True)
+    ))
+
+
+@receiver(post_init, sender=User)
+def remember_username(instance, **kwargs):
+    if "username" in instance.__dict__:
+        instance._stored_username = instance.username
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_shopping_lists(instance, created, **kwargs):
+    """
+    Сбрасывает кэш списков покупок с именем пользователя: его
+    собственного и тех, в чьих корзинах есть его рецепты.
+    """
+
+    stored = getattr(instance, "_stored_username", None)
+    instance._stored_username = instance.username
+    if created or stored in (None, instance.username):
+        return
+    bump_on_commit(
+        SHOPPING_CART_VERSION.format(instance.pk),
+        *(
+            SHOPPING_CART_VERSION.format(user_id)
+            for user_id in ShoppingCart.objects.filter(
+                recipe__author=instance
+            ).values_list("user_id", flat=True).distinct()
+        ),
+    )
+
+
+def bump_on_commit(*names):
+    transaction.on_commit(lambda: bump_cache_versions(*names))
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_responses(instance, created, **kwargs):
+    """Сбрасывает кэш ответов с рецептом, а для нового — и списки."""
+
+    if created:
+        bump_on_commit(
+            RECIPE_VERSION.format(instance.pk),
+            AUTHOR_RECIPES_VERSION.format(instance.author_id),
+            FEED_VERSION,
+        )
+    else:
+        bump_on_commit(RECIPE_VERSION.format(instance.pk))
+
+
+@receiver(pre_delete, sender=Recipe)
+def invalidate_deleted_recipe_responses(instance, **kwargs):
+    # Теги читаются до удаления: после него связей уже нет.
+    bump_on_commit(
+        RECIPE_VERSION.format(instance.pk),
+        AUTHOR_RECIPES_VERSION.format(instance.author_id),
+        FEED_VERSION,
+        *(
+            TAG_RECIPES_VERSION.format(tag_id)
+            for tag_id in instance.tags.values_list("pk", flat=True)
+        ),
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_tag_responses(instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш списков тегов, которые получил или потерял рецепт."""
+
+    if action == "pre_clear" and not reverse:
+        pk_set = instance.tags.values_list("pk", flat=True)
+    elif action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        bump_on_commit(TAG_RECIPES_VERSION.format(instance.pk))
+    elif pk_set:
+        bump_on_commit(*(
+            TAG_RECIPES_VERSION.format(tag_id) for tag_id in pk_set
+        ))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(instance, update_fields, **kwargs):
+    """Сбрасывает кэш ответов с рецептами пользователя после смены профиля."""
+
+    if update_fields is None or set(update_fields) - {"last_login"}:
+        bump_on_commit(AUTHOR_VERSION.format(instance.pk))
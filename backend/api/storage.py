@@ -0,0 +1,59 @@
+import hashlib
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+from recipes.models import MediaFile
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, называющее файлы по SHA-256 содержимого.
+    Одинаковые файлы сохраняются один раз, а адрес файла
+    никогда не указывает на другое содержимое.
+    """
+
+    def _save(self, name, content):
+        return self.save_many({name: content})[name]
+
+    def save_many(self, files):
+        """
+        Сохраняет файлы {имя: содержимое}, возвращает {имя: имя в хранилище}.
+        Строки MediaFile блокируются одним запросом до конца транзакции:
+        delete_unused дождется учета новых ссылок и не удалит файл,
+        который только что переиспользовали.
+        """
+
+        names = {
+            name: self.hashed_name(name, content)
+            for name, content in files.items()
+        }
+        with transaction.atomic(savepoint=False):
+            list(
+                MediaFile.objects.select_for_update()
+                .filter(name__in=names.values())
+                .values_list("pk", flat=True)
+            )
+            for name, content in files.items():
+                if self.exists(names[name]):
+                    continue
+                saved = super()._save(names[name], content)
+                if saved != names[name]:
+                    # Тот же файл успели записать параллельно.
+                    self.delete(saved)
+        return names
+
+    def hashed_name(self, name, content):
+        """Имя вида <каталог>/ab/abcdef....<расширение>."""
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        return posixpath.join(
+            posixpath.dirname(name),
+            hexdigest[:2],
+            hexdigest + posixpath.splitext(name)[1].lower(),
+        )
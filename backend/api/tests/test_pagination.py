@@ -0,0 +1,49 @@
+import base64
+import json
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.constants import INVALID_CURSOR
+
+
+def encode_cursor(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+class KeysetPaginationTests(APITestCase):
+    """Курсорная пагинация рецептов."""
+
+    def assert_invalid(self, cursor):
+        response = self.client.get("/api/recipes/", {"cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data["detail"], INVALID_CURSOR)
+
+    def test_first_page(self):
+        response = self.client.get("/api/recipes/", {"cursor": ""})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+
+    def test_malformed_cursor(self):
+        self.assert_invalid("не base64")
+        self.assert_invalid(encode_cursor([1, 2]))
+
+    def test_invalid_cursor_fields(self):
+        valid = {
+            "pub_date": "2024-01-01T00:00:00+00:00", "id": 1, "reverse": False
+        }
+        for field, value in (
+            ("pub_date", "не дата"),
+            ("pub_date", "2024-13-45"),
+            ("pub_date", 12),
+            ("id", "1"),
+            ("id", 1.5),
+            ("id", None),
+        ):
+            with self.subTest(field=field, value=value):
+                self.assert_invalid(encode_cursor({**valid, field: value}))
+        for field in valid:
+            with self.subTest(missing=field):
+                cursor = dict(valid)
+                del cursor[field]
+                self.assert_invalid(encode_cursor(cursor))
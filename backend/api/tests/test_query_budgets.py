@@ -0,0 +1,258 @@
+import base64
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework.test import APITransactionTestCase
+
+from api.constants import QUERY_BUDGETS
+from api.queries import assert_query_budget
+from api.reference import bump_version
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    Tag,
+    User,
+)
+from recipes.similarity import rebuild_similar_recipes
+
+TEMP_DIR = tempfile.mkdtemp()
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/"
+    "PchI7wAAAABJRU5ErkJggg=="
+)
+IMAGE = "data:image/png;base64," + base64.b64encode(PNG).decode()
+RECIPES_COUNT = 8
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(TEMP_DIR, "media"),
+    REFERENCE_DATA_STAMP=os.path.join(TEMP_DIR, "reference_version"),
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        }
+    },
+)
+class QueryBudgetTests(APITransactionTestCase):
+    """
+    Каждый маршрут из QUERY_BUDGETS укладывается в свой бюджет
+    на холодных кэшах и не делает повторяющихся запросов.
+    Транзакции коммитятся, поэтому в счет входят и запросы on_commit.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.create_data()
+        self.reset_caches()
+
+    def create_data(self):
+        self.author, self.reader, self.other = (
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pass"
+            )
+            for name in ("author", "reader", "other")
+        )
+        self.tags = [
+            Tag.objects.create(name=slug, slug=slug)
+            for slug in ("breakfast", "lunch", "dinner")
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"продукт {number}", measurement_unit="г"
+            )
+            for number in range(6)
+        ]
+        self.recipes = []
+        for number in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=self.author,
+                name=f"Рецепт {number}",
+                text="Описание",
+                cooking_time=10,
+                image=SimpleUploadedFile("photo.png", PNG, "image/png"),
+            )
+            recipe.tags.set(self.tags[number % 3:number % 3 + 2])
+            for ingredient in self.ingredients[number % 4:number % 4 + 3]:
+                RecipeIngredients.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+            self.recipes.append(recipe)
+        for recipe in self.recipes[:4]:
+            Favorite.objects.create(user=self.reader, recipe=recipe)
+            ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        Follow.objects.create(user=self.reader, subscribing=self.author)
+        rebuild_similar_recipes()
+
+    def reset_caches(self):
+        cache.clear()
+        bump_version()
+
+    def request(self, method, url, data=None, user=None):
+        self.client.force_authenticate(user or self.reader)
+        response = getattr(self.client, method)(url, data, format="json")
+        if response.streaming:
+            b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        assert_query_budget(response)
+        return response
+
+    def recipe_data(self):
+        return {
+            "name": "Новый рецепт",
+            "text": "Описание",
+            "cooking_time": 5,
+            "image": IMAGE,
+            "tags": [self.tags[0].pk, self.tags[2].pk],
+            "ingredients": [
+                {"id": ingredient.pk, "amount": 3}
+                for ingredient in self.ingredients[:4]
+            ],
+        }
+
+    def test_every_budget_is_covered(self):
+        covered = {
+            ("api:ingredient-list", "GET"),
+            ("api:ingredient-detail", "GET"),
+            ("api:tag-list", "GET"),
+            ("api:tag-detail", "GET"),
+            ("api:recipes-list", "GET"),
+            ("api:recipes-list", "POST"),
+            ("api:recipes-detail", "GET"),
+            ("api:recipes-detail", "PATCH"),
+            ("api:recipes-detail", "DELETE"),
+            ("api:recipes-by-ingredients", "GET"),
+            ("api:recipes-similar", "GET"),
+            ("api:recipes-favorite", "POST"),
+            ("api:recipes-favorite", "DELETE"),
+            ("api:recipes-shopping-cart", "POST"),
+            ("api:recipes-shopping-cart", "DELETE"),
+            ("api:recipes-get-link", "GET"),
+            ("api:recipes-download-shopping-cart", "GET"),
+            ("api:user-list", "GET"),
+            ("api:user-list", "POST"),
+            ("api:user-detail", "GET"),
+            ("api:user-me", "GET"),
+            ("api:user-me-avatar", "PUT"),
+            ("api:user-me-avatar", "DELETE"),
+            ("api:user-subscriptions", "GET"),
+            ("api:user-create-delete-subscribe", "POST"),
+            ("api:user-create-delete-subscribe", "DELETE"),
+        }
+        self.assertEqual(set(QUERY_BUDGETS), covered)
+
+    def test_reference_data(self):
+        ingredient, tag = self.ingredients[0], self.tags[0]
+        for url in (
+            "/api/ingredients/",
+            "/api/ingredients/?name=прод",
+            f"/api/ingredients/{ingredient.pk}/",
+            "/api/tags/",
+            f"/api/tags/{tag.pk}/",
+        ):
+            with self.subTest(url=url):
+                self.reset_caches()
+                self.request("get", url)
+
+    def test_recipe_reads(self):
+        recipe = self.recipes[0]
+        for url in (
+            "/api/recipes/",
+            "/api/recipes/?tags=breakfast&tags=lunch&is_favorited=1",
+            "/api/recipes/?is_in_shopping_cart=1",
+            f"/api/recipes/?author={self.author.pk}&cursor=",
+            f"/api/recipes/{recipe.pk}/",
+            "/api/recipes/by_ingredients/?ingredients="
+            + ",".join(str(ingredient.pk) for ingredient in self.ingredients),
+            f"/api/recipes/{recipe.pk}/similar/",
+            f"/api/recipes/{recipe.pk}/get-link/",
+            "/api/recipes/download_shopping_cart/",
+        ):
+            with self.subTest(url=url):
+                self.reset_caches()
+                self.request("get", url)
+
+    def test_anonymous_recipe_reads(self):
+        self.request("get", "/api/recipes/", user=None)
+        self.client.force_authenticate(None)
+        for url in ("/api/recipes/", f"/api/recipes/{self.recipes[0].pk}/"):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                assert_query_budget(response)
+
+    def test_recipe_create(self):
+        self.request("post", "/api/recipes/", self.recipe_data(), self.author)
+
+    def test_recipe_update(self):
+        self.request(
+            "patch",
+            f"/api/recipes/{self.recipes[0].pk}/",
+            self.recipe_data(),
+            self.author,
+        )
+
+    def test_recipe_delete(self):
+        self.request(
+            "delete", f"/api/recipes/{self.recipes[0].pk}/", user=self.author
+        )
+
+    def test_favorite_and_shopping_cart(self):
+        for action in ("favorite", "shopping_cart"):
+            for recipe, method in (
+                (self.recipes[-1], "post"), (self.recipes[0], "delete")
+            ):
+                with self.subTest(action=action, method=method):
+                    self.reset_caches()
+                    self.request(
+                        method, f"/api/recipes/{recipe.pk}/{action}/"
+                    )
+
+    def test_user_reads(self):
+        for url in (
+            "/api/users/",
+            f"/api/users/{self.author.pk}/",
+            "/api/users/me/",
+            "/api/users/subscriptions/?recipes_limit=2",
+        ):
+            with self.subTest(url=url):
+                self.reset_caches()
+                self.request("get", url)
+
+    def test_registration(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            "/api/users/",
+            {
+                "username": "newcomer",
+                "email": "newcomer@example.com",
+                "first_name": "Имя",
+                "last_name": "Фамилия",
+                "password": "Str0ng-pass-42",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        assert_query_budget(response)
+
+    def test_avatar(self):
+        self.request("put", "/api/users/me/avatar/", {"avatar": IMAGE})
+        self.reset_caches()
+        self.request("delete", "/api/users/me/avatar/")
+
+    def test_subscribe(self):
+        self.request(
+            "post", f"/api/users/{self.other.pk}/subscribe/?recipes_limit=2"
+        )
+        self.reset_caches()
+        self.request("delete", f"/api/users/{self.author.pk}/subscribe/")
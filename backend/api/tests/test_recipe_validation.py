@@ -0,0 +1,141 @@
+import base64
+import shutil
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.constants import REQUIRED_FIELD
+from recipes.models import Ingredient, Recipe, Tag, User
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/"
+    "PchI7wAAAABJRU5ErkJggg=="
+)
+IMAGE = "data:image/png;base64," + base64.b64encode(PNG).decode()
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class RecipeTagsValidationTests(APITestCase):
+    """Ошибки поля tags имеют ту же форму, что у PrimaryKeyRelatedField."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        self.tag = Tag.objects.create(name="Завтрак", slug="breakfast")
+        self.salt = Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        self.client.force_authenticate(self.author)
+
+    def post_recipe(self, tags):
+        return self.client.post(
+            reverse("api:recipes-list"),
+            {
+                "name": "Блины",
+                "text": "Смешать",
+                "cooking_time": 10,
+                "image": IMAGE,
+                "tags": tags,
+                "ingredients": [{"id": self.salt.pk, "amount": 5}],
+            },
+            format="json",
+        )
+
+    def test_unknown_tags_flat_list(self):
+        missing = self.tag.pk + 100
+        response = self.post_recipe([self.tag.pk, missing])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["tags"],
+            [
+                f'Недопустимый первичный ключ "{missing}" - '
+                "объект не существует."
+            ],
+        )
+
+    def test_empty_tags_required(self):
+        response = self.post_recipe([])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["tags"], [REQUIRED_FIELD])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipePartialUpdateTests(APITestCase):
+    """PATCH меняет только переданные поля."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        self.tag = Tag.objects.create(name="Завтрак", slug="breakfast")
+        self.salt = Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        self.flour = Ingredient.objects.create(
+            name="мука", measurement_unit="г"
+        )
+        self.client.force_authenticate(self.author)
+        response = self.client.post(
+            reverse("api:recipes-list"),
+            {
+                "name": "Блины",
+                "text": "Смешать",
+                "cooking_time": 10,
+                "image": IMAGE,
+                "tags": [self.tag.pk],
+                "ingredients": [{"id": self.salt.pk, "amount": 5}],
+            },
+            format="json",
+        )
+        self.recipe = Recipe.objects.get(pk=response.data["id"])
+        self.url = reverse("api:recipes-detail", args=[self.recipe.pk])
+
+    def test_patch_name_only(self):
+        response = self.client.patch(
+            self.url, {"name": "Оладьи"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, "Оладьи")
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag])
+        self.assertEqual(
+            list(
+                self.recipe.recipe_ingredients.values_list(
+                    "ingredient", "amount"
+                )
+            ),
+            [(self.salt.pk, 5)],
+        )
+
+    def test_patch_ingredients_only(self):
+        response = self.client.patch(
+            self.url,
+            {"ingredients": [{"id": self.flour.pk, "amount": 200}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, "Блины")
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag])
+        self.assertEqual(
+            list(
+                self.recipe.recipe_ingredients.values_list(
+                    "ingredient", "amount"
+                )
+            ),
+            [(self.flour.pk, 200)],
+        )
+
+    def test_patch_empty_tags_required(self):
+        response = self.client.patch(self.url, {"tags": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["tags"], [REQUIRED_FIELD])
@@ -0,0 +1,210 @@
+import base64
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api.shopping_cart import calculate_totals
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    Tag,
+    User,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/"
+    "PchI7wAAAABJRU5ErkJggg=="
+)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ShoppingCartTotalsTests(APITestCase):
+    """Итоги списков покупок следуют за корзинами и составом рецептов."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        self.buyer = User.objects.create_user(
+            username="buyer", email="buyer@example.com", password="pass"
+        )
+        self.tag = Tag.objects.create(name="Завтрак", slug="breakfast")
+        self.salt = Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        self.flour = Ingredient.objects.create(
+            name="мука", measurement_unit="г"
+        )
+        self.recipe = self.create_recipe({self.salt: 5, self.flour: 100})
+
+    def create_recipe(self, amounts):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name="Блины",
+            text="Смешать",
+            cooking_time=10,
+            image=SimpleUploadedFile("photo.png", PNG, "image/png"),
+        )
+        recipe.tags.set([self.tag])
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def totals(self):
+        return set(
+            ShoppingCartIngredient.objects.values_list(
+                "user", "ingredient", "amount"
+            )
+        )
+
+    def assert_totals(self, expected):
+        self.assertEqual(self.totals(), expected)
+        self.assertEqual(self.totals(), set(calculate_totals()))
+
+    def test_cart_rows_outside_api(self):
+        cart = ShoppingCart.objects.create(
+            user=self.buyer, recipe=self.recipe
+        )
+        self.assert_totals({
+            (self.buyer.pk, self.salt.pk, 5),
+            (self.buyer.pk, self.flour.pk, 100),
+        })
+        cart.user = self.author
+        cart.save()
+        self.assert_totals({
+            (self.author.pk, self.salt.pk, 5),
+            (self.author.pk, self.flour.pk, 100),
+        })
+        cart.delete()
+        self.assert_totals(set())
+
+    def test_recipe_ingredient_changes(self):
+        ShoppingCart.objects.create(user=self.buyer, recipe=self.recipe)
+        row = RecipeIngredients.objects.get(
+            recipe=self.recipe, ingredient=self.salt
+        )
+        row.amount = 7
+        row.save()
+        RecipeIngredients.objects.filter(
+            recipe=self.recipe, ingredient=self.flour
+        ).delete()
+        self.assert_totals({(self.buyer.pk, self.salt.pk, 7)})
+
+    def test_api_toggle_and_edit(self):
+        self.client.force_authenticate(self.buyer)
+        self.client.post(f"/api/recipes/{self.recipe.pk}/shopping_cart/")
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.pk}/",
+            {
+                "name": "Блины",
+                "text": "Смешать",
+                "cooking_time": 10,
+                "tags": [self.tag.pk],
+                "ingredients": [{"id": self.salt.pk, "amount": 3}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_totals({(self.buyer.pk, self.salt.pk, 3)})
+        self.client.force_authenticate(self.buyer)
+        self.client.delete(f"/api/recipes/{self.recipe.pk}/shopping_cart/")
+        self.assert_totals(set())
+
+    def test_failed_delete_keeps_totals_live(self):
+        ShoppingCart.objects.create(user=self.buyer, recipe=self.recipe)
+
+        def fail(**kwargs):
+            raise DatabaseError("delete failed")
+
+        post_delete.connect(fail, sender=RecipeIngredients)
+        try:
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                self.recipe.delete()
+        finally:
+            post_delete.disconnect(fail, sender=RecipeIngredients)
+        self.assert_totals({
+            (self.buyer.pk, self.salt.pk, 5),
+            (self.buyer.pk, self.flour.pk, 100),
+        })
+        RecipeIngredients.objects.filter(
+            recipe=self.recipe, ingredient=self.flour
+        ).delete()
+        ShoppingCart.objects.create(user=self.author, recipe=self.recipe)
+        self.assert_totals({
+            (self.buyer.pk, self.salt.pk, 5),
+            (self.author.pk, self.salt.pk, 5),
+        })
+
+    def test_cascade_delete_of_author(self):
+        other = self.create_recipe({self.salt: 1})
+        other.author = self.buyer
+        other.save()
+        for recipe in (self.recipe, other):
+            ShoppingCart.objects.create(user=self.buyer, recipe=recipe)
+        self.assert_totals({
+            (self.buyer.pk, self.salt.pk, 6),
+            (self.buyer.pk, self.flour.pk, 100),
+        })
+        self.author.delete()
+        self.assert_totals({(self.buyer.pk, self.salt.pk, 1)})
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    })
+    def test_download_follows_author_username(self):
+        ShoppingCart.objects.create(user=self.buyer, recipe=self.recipe)
+        self.client.force_authenticate(self.buyer)
+        url = "/api/recipes/download_shopping_cart/"
+        first = self.client.get(url, HTTP_ACCEPT="text/plain")
+        self.assertIn("author", b"".join(first.streaming_content).decode())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.username = "chef"
+            self.author.save()
+        second = self.client.get(
+            url, HTTP_ACCEPT="text/plain", HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertIn("chef", b"".join(second.streaming_content).decode())
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    })
+    def test_download_follows_ingredient_rename(self):
+        ShoppingCart.objects.create(user=self.buyer, recipe=self.recipe)
+        self.client.force_authenticate(self.buyer)
+        url = "/api/recipes/download_shopping_cart/"
+        cache.clear()
+        first = self.client.get(url, HTTP_ACCEPT="text/plain")
+        self.assertIn("Соль", b"".join(first.streaming_content).decode())
+        with self.captureOnCommitCallbacks(execute=True):
+            salt = Ingredient.objects.get(pk=self.salt.pk)
+            salt.name = "морская соль"
+            salt.measurement_unit = "ч. л."
+            salt.save()
+        second = self.client.get(
+            url, HTTP_ACCEPT="text/plain", HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+        self.assertEqual(second.status_code, 200)
+        content = b"".join(second.streaming_content).decode()
+        self.assertIn("Морская соль: 5 ч. л.", content)
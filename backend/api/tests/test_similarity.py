@@ -0,0 +1,91 @@
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from recipes.models import (
+    Ingredient, Recipe, RecipeIngredients, SimilarRecipe, Tag, User
+)
+from recipes.similarity import (
+    rebuild_similar_recipes, update_similar_recipes
+)
+from .test_shopping_cart import PNG
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SimilarRecipesTests(TestCase):
+    """Пересчет одного рецепта совпадает с полным пересчетом."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        tags = [
+            Tag.objects.create(name=f"Тег {number}", slug=f"tag{number}")
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"продукт {number}", measurement_unit="г"
+            )
+            for number in range(6)
+        ]
+        # Рецепт 3 связан с первым только тегом.
+        compositions = [
+            ((0, 1), (0, 1, 2)),
+            ((0,), (1, 2)),
+            ((2,), (0, 3)),
+            ((1,), (4,)),
+            ((), (0, 1, 5)),
+            ((2,), (4, 5)),
+        ]
+        self.recipes = []
+        for number, (tag_numbers, ingredient_numbers) in enumerate(
+            compositions
+        ):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f"Рецепт {number}",
+                text="Смешать",
+                cooking_time=10,
+                image=SimpleUploadedFile("photo.png", PNG, "image/png"),
+            )
+            recipe.tags.set([tags[index] for index in tag_numbers])
+            for index in ingredient_numbers:
+                RecipeIngredients.objects.create(
+                    recipe=recipe, ingredient=ingredients[index], amount=1
+                )
+            self.recipes.append(recipe)
+
+    def neighbours(self, recipe):
+        return list(
+            SimilarRecipe.objects.filter(recipe=recipe)
+            .order_by("-score", "similar_id")
+            .values_list("similar_id", "score")
+        )
+
+    def assert_incremental_matches_rebuild(self, max_posting):
+        rebuild_similar_recipes(max_posting=max_posting)
+        for recipe in self.recipes:
+            expected = self.neighbours(recipe)
+            SimilarRecipe.objects.filter(recipe=recipe).delete()
+            update_similar_recipes(recipe.pk, max_posting=max_posting)
+            self.assertEqual(self.neighbours(recipe), expected, recipe.name)
+
+    def test_incremental_matches_rebuild(self):
+        self.assert_incremental_matches_rebuild(max_posting=1000)
+        self.assertIn(
+            self.recipes[3].pk,
+            [similar_id for similar_id, _ in self.neighbours(self.recipes[0])],
+        )
+
+    def test_incremental_matches_rebuild_with_cutoff(self):
+        self.assert_incremental_matches_rebuild(max_posting=2)
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.storage import ContentAddressedStorage
+from recipes.models import MediaFile
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Файл с тем же содержимым сохраняется один раз под одним именем."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.location)
+        self.name = self.storage.hashed_name(
+            "recipes/photo.png", ContentFile(b"photo")
+        )
+
+    def save(self):
+        return self.storage.save("recipes/photo.png", ContentFile(b"photo"))
+
+    def files(self):
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(self.location)
+            for name in names
+        ]
+
+    def test_unreferenced_file_reused(self):
+        MediaFile.objects.create(name=self.name, references=0)
+        self.assertEqual(self.save(), self.name)
+        with mock.patch.object(
+            ContentAddressedStorage, "delete"
+        ) as delete:
+            self.assertEqual(self.save(), self.name)
+        delete.assert_not_called()
+        self.assertEqual(self.files(), [self.storage.path(self.name)])
+
+    def test_concurrent_write_keeps_hashed_name(self):
+        self.save()
+        # Первая проверка не видит файл, записанный параллельно.
+        with mock.patch.object(
+            self.storage, "exists", side_effect=[False, True, False]
+        ):
+            self.assertEqual(self.save(), self.name)
+        self.assertEqual(self.files(), [self.storage.path(self.name)])
+
+    def test_save_many_locks_once(self):
+        files = {
+            f"recipes/variants/photo_{size}.png": ContentFile(
+                str(size).encode()
+            )
+            for size in range(6)
+        }
+        with CaptureQueriesContext(connection) as queries:
+            names = self.storage.save_many(files)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(set(names.values())), len(files))
+        for name in names.values():
+            self.assertTrue(self.storage.exists(name))
@@ -1,39 +1,161 @@
+import csv
+import io
 from datetime import date
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.utils.formats import date_format
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
 
-from .constants import (DATE_FORMAT,
+from recipes.models import Recipe, ShoppingCart
+from recipes.similarity import update_similar_recipes
+from .cache import bump_cache_versions
+from .constants import (CSV_HEADER_ROW,
+                        DATE_FORMAT,
                         HEADER_ROW,
                         INGREDIENT_ROW,
                         LETTER_COUNT,
-                        RECIPES_ROW)
+                        PDF_FONT_NAME,
+                        PDF_FONT_SIZE,
+                        PDF_MARGIN,
+                        RECIPES_ROW,
+                        SHOPPING_CART_VERSION)
 
 
 def generate_shopping_list(user_data, recipe_list, ingredient_list):
     """
-    Генерирует текстовый список покупок для заданных рецептов и ингредиентов.
+    Построчно генерирует текстовый список покупок
+    для заданных рецептов и ингредиентов.
     """
 
-    return "\n".join(
-        [
-            HEADER_ROW.format(user_data.username,
-                              date_format(date.today(),
-                                          DATE_FORMAT)),
-            "Продукты:",
-            *[
-                INGREDIENT_ROW.format(
-                    index,
-                    ingredient.name.capitalize(),
-                    ingredient.total_amount,
-                    ingredient.measurement_unit,
-                )
-                for index, ingredient in enumerate(ingredient_list, 1)
-            ],
-            "Рецепты:",
-            *[
-                RECIPES_ROW.format(recipe.name[:LETTER_COUNT],
-                                   recipe.author.username)
-                for recipe in recipe_list
-            ],
-        ]
+    yield HEADER_ROW.format(
+        user_data.username, date_format(date.today(), DATE_FORMAT)
+    ) + "\n"
+    yield "Продукты:\n"
+    for index, ingredient in enumerate(ingredient_list, 1):
+        yield INGREDIENT_ROW.format(
+            index,
+            ingredient["name"].capitalize(),
+            ingredient["total_amount"],
+            ingredient["measurement_unit"],
+        ) + "\n"
+    yield "Рецепты:\n"
+    for recipe in recipe_list:
+        yield RECIPES_ROW.format(
+            recipe["name"][:LETTER_COUNT], recipe["username"]
+        ) + "\n"
+
+
+def generate_shopping_list_csv(user_data, recipe_list, ingredient_list):
+    """Построчно генерирует список покупок в формате CSV."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def row(*values):
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    yield "\ufeff" + row(*CSV_HEADER_ROW)
+    for index, ingredient in enumerate(ingredient_list, 1):
+        yield row(
+            index,
+            ingredient["name"].capitalize(),
+            ingredient["total_amount"],
+            ingredient["measurement_unit"],
+        )
+
+
+def generate_shopping_list_pdf(user_data, recipe_list, ingredient_list):
+    """Генерирует список покупок в формате PDF."""
+
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    position = height - PDF_MARGIN
+    for line in generate_shopping_list(
+        user_data, recipe_list, ingredient_list
+    ):
+        if position < PDF_MARGIN:
+            document.showPage()
+            position = height - PDF_MARGIN
+        document.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+        document.drawString(PDF_MARGIN, position, line.rstrip("\n"))
+        position -= PDF_FONT_SIZE * 1.5
+    document.save()
+    yield buffer.getvalue()
+
+
+SHOPPING_LIST_GENERATORS = {
+    "txt": generate_shopping_list,
+    "csv": generate_shopping_list_csv,
+    "pdf": generate_shopping_list_pdf,
+}
+
+
+def invalidate_shopping_lists(recipe):
+    """Сбрасывает кэш списков покупок у всех, чья корзина содержит recipe."""
+
+    bump_cache_versions(*(
+        SHOPPING_CART_VERSION.format(user_id)
+        for user_id in ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list("user_id", flat=True)
+    ))
+
+
+def schedule_similar_recipes_update(recipe):
+    """Пересчитывает похожие рецепты после коммита состава и тегов."""
+
+    transaction.on_commit(lambda: update_similar_recipes(recipe.pk))
+
+
+def attach_recipes_preview(authors, limit=None):
+    """
+    Добавляет авторам атрибут recipes_preview с их последними рецептами.
+    Первые limit рецептов всех авторов выбираются одним запросом
+    с ROW_NUMBER() OVER (PARTITION BY author).
+    """
+
+    if not authors:
+        return
+    recipes = (
+        Recipe.objects.filter(author__in=authors)
+        .only(
+            "id", "name", "image", "image_variants", "cooking_time",
+            "author_id",
+        )
+        .order_by()
     )
+    if limit is not None:
+        sql, params = recipes.annotate(
+            recipe_position=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=(F("pub_date").desc(), F("id").desc()),
+            )
+        ).query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f"SELECT * FROM ({sql}) ranked WHERE ranked.recipe_position <= %s "
+            "ORDER BY ranked.recipe_position",
+            (*params, int(limit)),
+        )
+    else:
+        recipes = recipes.order_by("-pub_date", "-id")
+    previews = {author.id: [] for author in authors}
+    for recipe in recipes:
+        previews[recipe.author_id].append(recipe)
+    for author in authors:
+        author.recipes_preview = previews[author.id]
@@ -1,15 +1,34 @@
 from datetime import date
+from hashlib import md5
+from itertools import chain
+
 import hashids
 
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Value
 from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import redirect
-from django.http import FileResponse, HttpResponseNotFound
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotFound,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.utils.formats import date_format
+from django.utils.http import parse_etags, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from recipes.models import (
-    Favorite, Follow, Ingredient, Recipe, ShoppingCart, Tag
+    Favorite,
+    Follow,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    Tag,
 )
 from rest_framework import serializers, status
 from rest_framework.decorators import action
@@ -19,39 +38,82 @@ from rest_framework.permissions import (
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from .filters import LimitFilter, NameFilter, RecipeFilter
-from .pagination import CustomPagination
+from .cache import cache_stream, get_cache_version, get_cache_versions
+from .filters import LimitFilter, RecipeFilter
+from .membership import invalidate_membership
+from .pagination import CustomPagination, RecipePagination
 from .permissions import IsAuthorOrReadOnly
+from .reference import get_snapshot
+from .renderers import (
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+    TextShoppingListRenderer,
+)
+from .response_cache import (
+    get_cached_response, response_cache_key, set_cached_response
+)
 from .serializers import (
     FollowSerializer,
     IngredientSerializer,
+    RecipeCoverageSerializer,
     RecipeCreateSerializer,
     RecipeListSerializer,
     RecipeSerializer,
+    SimilarRecipeSerializer,
     TagSerializer,
     UserAvatarSerializer,
 )
 
-from .utils import generate_shopping_list
+from .utils import SHOPPING_LIST_GENERATORS, attach_recipes_preview
 from . import constants
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class ReferenceDataViewSet(ReadOnlyModelViewSet):
+    """
+    Базовое представление для справочников,
+    которое отдает данные из снимка в памяти процесса.
+    """
+
+    pagination_class = None
+    snapshot_items = None
+    snapshot_json = None
+
+    def list(self, request, *args, **kwargs):
+        return HttpResponse(
+            getattr(get_snapshot(), self.snapshot_json),
+            content_type="application/json",
+        )
+
+    def retrieve(self, request, pk=None):
+        items = getattr(get_snapshot(), self.snapshot_items)
+        try:
+            return Response(items[int(pk)])
+        except (KeyError, ValueError):
+            raise Http404
+
+
+class IngredientViewSet(ReferenceDataViewSet):
     """Представление для модели Ingredient."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = NameFilter
-    pagination_class = None
+    snapshot_items = "ingredients"
+    snapshot_json = "ingredients_json"
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name:
+            return Response(get_snapshot().ingredients_startswith(name))
+        return super().list(request, *args, **kwargs)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReferenceDataViewSet):
     """Представление для модели Tag."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = None
+    snapshot_items = "tags"
+    snapshot_json = "tags_json"
 
 
 class RecipeViewSet(ModelViewSet):
@@ -64,21 +126,178 @@ class RecipeViewSet(ModelViewSet):
     http_method_names = (
         "get", "post", "patch", "delete", "head", "options", "trace"
     )
-    pagination = CustomPagination
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        if self.action not in ("list", "retrieve", "by_ingredients"):
+            return Recipe.objects.all()
+        # Отметки избранного, корзины и подписки берутся из get_membership.
+        return Recipe.objects.select_related("author").prefetch_related(
+            "tags",
+            Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredients.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            "list",
+            self.get_list_dependencies,
+            settings.RECIPE_LIST_CACHE_TIMEOUT,
+            super().list,
+            request, *args, **kwargs,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            "detail",
+            lambda: [constants.RECIPE_VERSION.format(kwargs["pk"])],
+            settings.RECIPE_DETAIL_CACHE_TIMEOUT,
+            super().retrieve,
+            request, *args, **kwargs,
+        )
+
+    def get_list_dependencies(self):
+        """Версии, сдвигаемые при появлении и удалении рецептов в списке."""
+
+        params = self.request.query_params
+        tags_by_slug = get_snapshot().tags_by_slug
+        dependencies = [
+            *(
+                constants.AUTHOR_RECIPES_VERSION.format(author)
+                for author in params.getlist("author")
+            ),
+            *(
+                constants.TAG_RECIPES_VERSION.format(tags_by_slug[slug]["id"])
+                for slug in params.getlist("tags")
+                if slug in tags_by_slug
+            ),
+        ]
+        return dependencies or [constants.FEED_VERSION]
+
+    def cached_response(self, kind, get_dependencies, timeout, render,
+                        request, *args, **kwargs):
+        """
+        Ответ анонимному пользователю из кэша. Запись действительна,
+        пока не сдвинуты версии списка, показанных рецептов и их авторов.
+        """
+
+        key = response_cache_key(request, kind)
+        if key is None:
+            return render(request, *args, **kwargs)
+        data = get_cached_response(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        # Версии списка читаются до выборки: изменение, случившееся
+        # во время отрисовки, сбросит запись при следующем обращении.
+        versions = get_cache_versions(*get_dependencies())
+        response = render(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            recipes = (
+                response.data["results"] if kind == "list" else [response.data]
+            )
+            versions.update(get_cache_versions(*chain.from_iterable(
+                (
+                    constants.RECIPE_VERSION.format(recipe["id"]),
+                    constants.AUTHOR_VERSION.format(recipe["author"]["id"]),
+                )
+                for recipe in recipes
+            )))
+            set_cached_response(key, response.data, versions, timeout)
+        response["X-Cache"] = "MISS"
+        return response
 
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return RecipeSerializer
+        if self.action == "by_ingredients":
+            return RecipeCoverageSerializer
         return RecipeCreateSerializer
 
+    def get_ingredient_ids(self, values):
+        """Разбирает ingredients=1,2&ingredients=3 в множество id."""
+
+        try:
+            ingredient_ids = {
+                int(value)
+                for item in values
+                for value in item.split(",")
+                if value.strip()
+            }
+        except ValueError:
+            raise serializers.ValidationError(
+                {"ingredients": constants.INVALID_ID_LIST}
+            )
+        if not ingredient_ids:
+            raise serializers.ValidationError(
+                {"ingredients": constants.REQUIRED_FIELD}
+            )
+        if len(ingredient_ids) > constants.MAX_AVAILABLE_INGREDIENTS:
+            raise serializers.ValidationError({
+                "ingredients": constants.TOO_MANY_ITEMS.format(
+                    constants.MAX_AVAILABLE_INGREDIENTS
+                )
+            })
+        return ingredient_ids
+
+    @action(
+        ["get"],
+        detail=False,
+        url_path="by_ingredients",
+        pagination_class=CustomPagination,
+    )
+    def by_ingredients(self, request):
+        """
+        Рецепты из имеющихся продуктов: сначала те, где докупать
+        нужно меньше всего. Кандидаты и число совпадений берутся
+        из индекса (ingredient, recipe) только по указанным продуктам.
+        """
+
+        ingredient_ids = self.get_ingredient_ids(
+            request.query_params.getlist("ingredients")
+        )
+        ranked = self.paginate_queryset(
+            self.filter_queryset(Recipe.objects.all())
+            .filter(recipe_ingredients__ingredient__in=ingredient_ids)
+            .annotate(
+                matched_count=Count("recipe_ingredients", distinct=True)
+            )
+            .order_by(
+                F("ingredients_count") - F("matched_count"),
+                "-matched_count",
+                *Recipe._meta.ordering,
+            )
+            .values_list("pk", "matched_count")
+        )
+        recipes = self.get_queryset().in_bulk([pk for pk, _ in ranked])
+        for pk, matched_count in ranked:
+            recipes[pk].matched_count = matched_count
+        serializer = self.get_serializer(
+            [recipes[pk] for pk, _ in ranked],
+            many=True,
+            context={
+                **self.get_serializer_context(),
+                "available_ingredients": ingredient_ids,
+            },
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
     def _handle_recipe_list_item(self, request, model):
         recipe = self.get_object()
         if request.method == "DELETE":
             try:
                 model.objects.get(user=request.user, recipe=recipe).delete()
+                invalidate_membership(request)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             except model.DoesNotExist:
                 return Response(
@@ -93,6 +312,7 @@ class RecipeViewSet(ModelViewSet):
             raise serializers.ValidationError(
                 {"error": f"Рецепт '{recipe}' уже добавлен в список любимых"}
             )
+        invalidate_membership(request)
 
         return Response(
             RecipeListSerializer(recipe).data, status=status.HTTP_201_CREATED
@@ -116,6 +336,28 @@ class RecipeViewSet(ModelViewSet):
     def shopping_cart(self, request, pk):
         return self._handle_recipe_list_item(request, ShoppingCart)
 
+    @action(["get"], detail=True, url_path="similar")
+    def similar(self, request, pk=None):
+        """Заранее посчитанные похожие рецепты: один поиск по индексу."""
+
+        if not pk.isdigit():
+            raise Http404
+        recipes = list(
+            Recipe.objects.filter(neighbour_of__recipe_id=pk)
+            .annotate(similarity=F("neighbour_of__score"))
+            .only("id", "name", "image", "image_variants", "cooking_time")
+            .order_by("-similarity", "id")[
+                :constants.SIMILAR_RECIPES_COUNT
+            ]
+        )
+        if not recipes:
+            self.get_object()
+        return Response(
+            SimilarRecipeSerializer(
+                recipes, many=True, context=self.get_serializer_context()
+            ).data
+        )
+
     @action(
         detail=True,
         methods=['get'],
@@ -133,22 +375,67 @@ class RecipeViewSet(ModelViewSet):
         detail=False,
         url_path="download_shopping_cart",
         permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            TextShoppingListRenderer,
+            CSVShoppingListRenderer,
+            PDFShoppingListRenderer,
+        ],
     )
     def download_shopping_cart(self, request):
-        recipes = Recipe.objects.filter(shoppingcarts__user=request.user)
-        ingredients = (
-            Ingredient.objects.filter(recipes__in=recipes)
-            .annotate(total_amount=Sum("recipe_ingredients__amount"))
-            .order_by("name")
-        )
-        return FileResponse(
-            generate_shopping_list(request.user, recipes, ingredients),
-            content_type="text/plain; charset=utf-8",
-            as_attachment=True,
-            filename=constants.FILENAME.format(
-                date_format(date.today(), constants.DATE_FORMAT_SHORT)
+        renderer = request.accepted_renderer
+        today = date.today()
+        cache_key = constants.SHOPPING_LIST_CACHE_KEY.format(
+            request.user.id,
+            get_cache_version(
+                constants.SHOPPING_CART_VERSION.format(request.user.id)
             ),
+            renderer.format,
+            today.isoformat(),
+        )
+        etag = quote_etag(md5(cache_key.encode()).hexdigest())
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(content)
+        else:
+            ingredients = (
+                ShoppingCartIngredient.objects.filter(user=request.user)
+                .values(
+                    name=F("ingredient__name"),
+                    measurement_unit=F("ingredient__measurement_unit"),
+                    total_amount=F("amount"),
+                )
+                .order_by("name")
+            )
+            recipes = Recipe.objects.filter(
+                shoppingcarts__user=request.user
+            ).values("name", username=F("author__username"))
+            response = StreamingHttpResponse(
+                cache_stream(
+                    SHOPPING_LIST_GENERATORS[renderer.format](
+                        request.user, recipes, ingredients
+                    ),
+                    cache_key,
+                    constants.SHOPPING_LIST_CACHE_TIMEOUT,
+                )
+            )
+        response["Content-Type"] = (
+            f"{renderer.media_type}; charset={renderer.charset}"
+            if renderer.charset
+            else renderer.media_type
         )
+        response["Content-Disposition"] = 'attachment; filename="{}"'.format(
+            constants.FILENAME.format(
+                date_format(today, constants.DATE_FORMAT_SHORT),
+                renderer.format,
+            )
+        )
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
 
 def redirect_to_recipe(request, short_id):
@@ -174,10 +461,12 @@ class FoodgramUserViewSet(UserViewSet):
         return super().get_permissions()
 
     @action(["put", "delete"], detail=False, url_path="me/avatar")
+    @transaction.atomic
     def me_avatar(self, request):
         user = request.user
         if request.method == "DELETE":
-            user.avatar.delete()
+            user.avatar = None
+            user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         serializer = UserAvatarSerializer(user, data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -191,15 +480,20 @@ class FoodgramUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
-        subscribe_data = FollowSerializer(
+        authors = self.paginate_queryset(
             self.filter_queryset(
-                self.get_queryset().filter(authors__user=request.user)
-            ),
-            context={"request": request},
-            many=True,
-        ).data
+                self.get_queryset()
+                .filter(authors__user=request.user)
+                .annotate(is_subscribed=Value(True))
+            )
+        )
+        attach_recipes_preview(
+            authors, request.query_params.get("recipes_limit")
+        )
         return self.get_paginated_response(
-            self.paginate_queryset(subscribe_data)
+            FollowSerializer(
+                authors, context={"request": request}, many=True
+            ).data
         )
 
     @action(
@@ -208,6 +502,7 @@ class FoodgramUserViewSet(UserViewSet):
         url_path="subscribe",
         permission_classes=[IsAuthenticated],
     )
+    @transaction.atomic
     def create_delete_subscribe(self, request, id=None):
         author = self.get_object()
         model = Follow
@@ -216,6 +511,7 @@ class FoodgramUserViewSet(UserViewSet):
                 model.objects.get(
                     user=request.user, subscribing=author
                 ).delete()
+                invalidate_membership(request)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             except model.DoesNotExist:
                 return Response(
@@ -233,6 +529,11 @@ class FoodgramUserViewSet(UserViewSet):
                 {"subscribe": constants.ALREADY_SUBSCRIBED_ERROR.format(
                     author)}
             )
+        invalidate_membership(request)
+        author.is_subscribed = True
+        attach_recipes_preview(
+            [author], request.query_params.get("recipes_limit")
+        )
         return Response(
             FollowSerializer(author, context={"request": request}).data,
             status=status.HTTP_201_CREATED,
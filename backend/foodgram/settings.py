@@ -40,6 +40,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.QueryCountMiddleware",
 ]
 
 ROOT_URLCONF = "foodgram.urls"
@@ -93,6 +94,8 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+DEFAULT_FILE_STORAGE = "api.storage.ContentAddressedStorage"
+
 AUTH_USER_MODEL = "recipes.FoodgramUser"
 
 
@@ -127,6 +130,30 @@ REST_FRAMEWORK = {
 
 CSV_FILES_DIR = os.path.join(BASE_DIR, 'data')
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", os.path.join(BASE_DIR, ".cache")),
+    }
+}
+
+# Время жизни кэша ответов анонимным пользователям, в секундах.
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv("RECIPE_LIST_CACHE_TIMEOUT", 60))
+RECIPE_DETAIL_CACHE_TIMEOUT = int(
+    os.getenv("RECIPE_DETAIL_CACHE_TIMEOUT", 300)
+)
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+
+REFERENCE_DATA_STAMP = os.getenv(
+    "REFERENCE_DATA_STAMP", os.path.join(BASE_DIR, ".reference_version")
+)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -137,3 +164,21 @@ DATABASES = {
         "PORT": int(os.getenv("DB_PORT", 5432)),
     }
 }
+
+QUERY_COUNT_HEADERS = DEBUG
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api.queries": {
+            "handlers": ["console"],
+            "level": os.getenv("QUERY_LOG_LEVEL", "WARNING"),
+        },
+    },
+}
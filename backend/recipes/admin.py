@@ -1,9 +1,24 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth import models
 from django.contrib.auth.admin import UserAdmin
+from django.core.cache import cache
+from django.db.models import Count, Min, Prefetch
 from django.utils.safestring import mark_safe
 
-from api.constants import MIN_COOKING_TIME, CHOICES
+from api.constants import (
+    ADMIN_FILTER_CACHE_TIMEOUT,
+    CHOICES,
+    COOKING_TIME_FILTER_CACHE_KEY,
+    MIN_COOKING_TIME,
+)
+from api.utils import (
+    invalidate_shopping_lists, schedule_similar_recipes_update
+)
+from .counters import refresh_counter
+from .images import variant_url
 from .models import (
     Favorite,
     Follow,
@@ -32,42 +47,156 @@ class CookingTimeFilter(admin.SimpleListFilter):
     title = "Время приготовления"
     parameter_name = "cooking_time"
 
-    def _get_filter_recipes(self, range_name):
-        return Recipe.objects.filter(
-            cooking_time__range=self.cooking_time_filters[range_name]
+    @staticmethod
+    def calculate_buckets(recipes):
+        """
+        Пороги и количество рецептов в каждой группе
+        по одному агрегирующему запросу.
+        """
+
+        recipes_by_time = list(
+            recipes.values_list("cooking_time")
+            .annotate(recipes_count=Count("id"))
+            .order_by("cooking_time")
         )
-
-    def lookups(self, request, model_admin):
-        cooking_times = model_admin.model.objects.values_list(
-            'cooking_time', flat=True
-        ).distinct().order_by('cooking_time')
-        cooking_times = list(cooking_times)
-        count = len(cooking_times)
+        count = len(recipes_by_time)
         if count < MIN_COOKING_TIME:
-            return
+            return None
+        cooking_times = [cooking_time for cooking_time, _ in recipes_by_time]
         threshold_25 = cooking_times[count // 4]
         threshold_75 = cooking_times[(count * 3) // 4]
-        self.cooking_time_filters = {
+        ranges = {
             "fast": (cooking_times[0], threshold_25 - 1),
             "middle": (threshold_25, threshold_75 - 1),
             "slow": (threshold_75, cooking_times[-1]),
         }
-        fast = self._get_filter_recipes("fast").count()
-        middle = self._get_filter_recipes("middle").count()
-        slow = self._get_filter_recipes("slow").count()
+        return {
+            name: (low, high, sum(
+                recipes_count
+                for cooking_time, recipes_count in recipes_by_time
+                if low <= cooking_time <= high
+            ))
+            for name, (low, high) in ranges.items()
+        }
+
+    def lookups(self, request, model_admin):
+        buckets = cache.get(COOKING_TIME_FILTER_CACHE_KEY)
+        if buckets is None:
+            buckets = self.calculate_buckets(model_admin.model.objects)
+            cache.set(
+                COOKING_TIME_FILTER_CACHE_KEY,
+                buckets or {},
+                ADMIN_FILTER_CACHE_TIMEOUT,
+            )
+        if not buckets:
+            return
+        self.cooking_time_filters = {
+            name: (low, high) for name, (low, high, _) in buckets.items()
+        }
+        threshold_25 = buckets["middle"][0]
+        threshold_75 = buckets["slow"][0]
         return (
-            ("fast", f"До {threshold_25} мин ({fast})"),
-            ("middle", f"От {threshold_25} до {threshold_75} мин ({middle})"),
-            ("slow", f"От {threshold_75} минут и более ({slow})"),
+            ("fast", f"До {threshold_25} мин ({buckets['fast'][2]})"),
+            (
+                "middle",
+                f"От {threshold_25} до {threshold_75} мин "
+                f"({buckets['middle'][2]})",
+            ),
+            (
+                "slow",
+                f"От {threshold_75} минут и более ({buckets['slow'][2]})",
+            ),
         )
 
     def queryset(self, request, recipes):
-        return self._get_filter_recipes(
-            self.value())if self.value() else recipes
+        filters = getattr(self, "cooking_time_filters", {})
+        if self.value() in filters:
+            return recipes.filter(cooking_time__range=filters[self.value()])
+        return recipes
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """
+    Фильтр по внешнему ключу с поиском через autocomplete админки.
+    Не перечисляет всю связанную таблицу в боковой панели.
+    """
+
+    template = "admin/autocomplete_filter.html"
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.field = self.get_form_field(model, model_admin.admin_site)
+
+    @classmethod
+    def get_form_field(cls, model, admin_site):
+        field = model._meta.get_field(cls.field_name)
+        return forms.ModelChoiceField(
+            queryset=field.remote_field.model.objects.all(),
+            widget=AutocompleteSelect(
+                field, admin_site, attrs={"style": "width: 100%"}
+            ),
+            required=False,
+        )
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def choices(self, changelist):
+        yield {
+            "widget": self.field.widget.render(
+                self.parameter_name, self.value()
+            ),
+            "params": [
+                (name, value)
+                for name, value in changelist.params.items()
+                if name not in (self.parameter_name, PAGE_VAR)
+            ],
+        }
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_name: self.value()})
+        return queryset
+
+
+class AuthorFilter(AutocompleteFilter):
+    """Фильтр рецептов по автору."""
+
+    title = "Автор"
+    parameter_name = "author"
+    field_name = "author"
+
+
+class UserFilter(AutocompleteFilter):
+    """Фильтр по пользователю."""
+
+    title = "Пользователь"
+    parameter_name = "user"
+    field_name = "user"
+
+
+class AutocompleteFilterMixin:
+    """Подключает скрипты autocomplete для фильтров списка."""
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, type) and issubclass(
+                list_filter, AutocompleteFilter
+            ):
+                media += list_filter.get_form_field(
+                    self.model, self.admin_site
+                ).widget.media
+        return media
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     """Административный интерфейс"""
 
     list_display = (
@@ -82,20 +211,43 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     list_display_links = ("name",)
     search_fields = ("author__username", "name", "tags__name")
-    list_filter = ("tags", "author", CookingTimeFilter)
-    readonly_fields = ("favorites_count",)
+    list_filter = ("tags", AuthorFilter, CookingTimeFilter)
+    autocomplete_fields = ("author",)
+    readonly_fields = ("favorites_count", "shopping_carts_count")
     inlines = [RecipeIngredientsAdmin]
 
-    @admin.display(description="В избранном")
-    def favorites_count(self, recipe):
-        return recipe.favorites.count()
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("author")
+            .annotate(first_tag_name=Min("tags__name"))
+            .prefetch_related(
+                Prefetch("tags", queryset=Tag.objects.order_by("name")),
+                "recipe_ingredients__ingredient",
+            )
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_counter(
+            Recipe,
+            "ingredients_count",
+            RecipeIngredients,
+            "recipe",
+            [form.instance.pk],
+        )
+        schedule_similar_recipes_update(form.instance)
+        if change:
+            invalidate_shopping_lists(form.instance)
 
     @admin.display(description="Фото")
     @mark_safe
     def image_thumbnail(self, recipe):
-        return f'<img src="{recipe.image.url}" width="40" height="40" />'
+        url = variant_url(recipe.image, recipe.image_variants, "thumb")
+        return f'<img src="{url}" width="40" height="40" />'
 
-    @admin.display(description="Тэги")
+    @admin.display(description="Тэги", ordering="first_tag_name")
     @mark_safe
     def tags_list(self, recipe):
         return "<br>".join(tag.name for tag in recipe.tags.all())
@@ -115,9 +267,14 @@ class RecipeCountMixin:
     Миксин для отображения количества рецептов, связанных с моделью.
     """
 
-    @admin.display(description="Рецептов")
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipe_count=Count("recipes")
+        )
+
+    @admin.display(description="Рецептов", ordering="recipe_count")
     def recipe_count(self, model):
-        return model.recipes.count()
+        return model.recipe_count
 
 
 class HasRecipeFilter(admin.SimpleListFilter):
@@ -131,14 +288,14 @@ class HasRecipeFilter(admin.SimpleListFilter):
 
     def queryset(self, request, ingredients):
         if self.value() == "yes":
-            return ingredients.filter(recipes__isnull=False).distinct()
+            return ingredients.filter(recipe_count__gt=0)
         elif self.value() == "no":
-            return ingredients.filter(recipes__isnull=True)
+            return ingredients.filter(recipe_count=0)
         return ingredients
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin, RecipeCountMixin):
+class IngredientAdmin(RecipeCountMixin, admin.ModelAdmin):
     """Административный интерфейс для модели Ingredient."""
 
     list_display = ("name", "measurement_unit", "recipe_count")
@@ -147,7 +304,7 @@ class IngredientAdmin(admin.ModelAdmin, RecipeCountMixin):
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin, RecipeCountMixin):
+class TagAdmin(RecipeCountMixin, admin.ModelAdmin):
     """Административный интерфейс для модели Tag."""
 
     list_display = ("name", "slug", "recipe_count")
@@ -155,25 +312,27 @@ class TagAdmin(admin.ModelAdmin, RecipeCountMixin):
 
 
 @admin.register(Favorite, ShoppingCart)
-class RecipeListAdmin(admin.ModelAdmin):
+class RecipeListAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     """Административный интерфейс для моделей Favorite и ShoppingCart."""
 
     list_display = ("user", "recipe")
-    search_fields = ("user",)
-    list_filter = ("user",)
+    search_fields = ("user__username", "recipe__name")
+    list_filter = (UserFilter,)
+    autocomplete_fields = ("user", "recipe")
+    list_select_related = ("user", "recipe")
 
 
 class RelatedObjectsFilter(admin.SimpleListFilter):
-    """Для фильтров, проверяющих наличие связанных объектов."""
+    """Для фильтров, проверяющих наличие связанных объектов по счетчику."""
 
-    related_name = None
+    counter_field = None
     title = None
 
     def __init__(self, request, params, model, model_admin):
         super().__init__(request, params, model, model_admin)
         self.related_filters = {
-            "yes": {f"{self.related_name}__isnull": False},
-            "no": {f"{self.related_name}__isnull": True},
+            "yes": {f"{self.counter_field}__gt": 0},
+            "no": {self.counter_field: 0},
         }
 
     def lookups(self, request, model_admin):
@@ -181,9 +340,7 @@ class RelatedObjectsFilter(admin.SimpleListFilter):
 
     def queryset(self, request, users):
         if self.value():
-            return users.filter(
-                **self.related_filters[self.value()]
-            ).distinct()
+            return users.filter(**self.related_filters[self.value()])
         return users
 
 
@@ -192,7 +349,7 @@ class HasRecipesFilter(RelatedObjectsFilter):
 
     title = "Имеет рецепты"
     parameter_name = "has_recipes"
-    related_name = "recipes"
+    counter_field = "recipes_count"
 
 
 class HasSubscriptionsFilter(RelatedObjectsFilter):
@@ -200,7 +357,7 @@ class HasSubscriptionsFilter(RelatedObjectsFilter):
 
     title = "Имеет подписки"
     parameter_name = "has_subscriptions"
-    related_name = "subscribers"
+    counter_field = "following_count"
 
 
 class HasFollowersFilter(RelatedObjectsFilter):
@@ -208,11 +365,11 @@ class HasFollowersFilter(RelatedObjectsFilter):
 
     title = "Имеет подписчиков"
     parameter_name = "has_subscribers"
-    related_name = "authors"
+    counter_field = "followers_count"
 
 
 @admin.register(User)
-class FoodgramUserAdmin(UserAdmin, RecipeCountMixin):
+class FoodgramUserAdmin(UserAdmin):
     """Административный интерфейс для модели User."""
 
     fieldsets = UserAdmin.fieldsets + ((None, {"fields": ("avatar",)}),)
@@ -222,9 +379,9 @@ class FoodgramUserAdmin(UserAdmin, RecipeCountMixin):
         "full_name",
         "email",
         "avatar_thumbnail",
-        "recipe_count",
-        "subscriber_count",
-        "author_count",
+        "recipes_count",
+        "following_count",
+        "followers_count",
     )
     list_display_links = ("username",)
     search_fields = ("email", "username")
@@ -242,20 +399,14 @@ class FoodgramUserAdmin(UserAdmin, RecipeCountMixin):
     @mark_safe
     def avatar_thumbnail(self, user):
         if user.avatar:
-            return f'<img src="{user.avatar.url}" width="40" height="40" />'
+            url = variant_url(user.avatar, user.avatar_variants, "thumb")
+            return f'<img src="{url}" width="40" height="40" />'
         return ""
 
-    @admin.display(description="Подписок")
-    def subscriber_count(self, user):
-        return user.subscribers.count()
-
-    @admin.display(description="Подписчиков")
-    def author_count(self, user):
-        return user.authors.count()
-
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     """Административный интерфейс для модели Follow."""
 
     list_display = ("user", "subscribing")
+    list_select_related = ("user", "subscribing")
@@ -5,3 +5,16 @@ class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
     verbose_name = "рецепты"
+
+    def ready(self):
+        from .signals import (
+            connect_counters,
+            connect_image_variants,
+            connect_search_vectors,
+            connect_tags_masks,
+        )
+
+        connect_counters()
+        connect_image_variants()
+        connect_search_vectors()
+        connect_tags_masks()
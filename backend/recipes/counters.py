@@ -0,0 +1,53 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Favorite, Follow, Recipe, RecipeIngredients, ShoppingCart, User
+)
+
+# Денормализованные счетчики:
+# (модель, поле счетчика, связанная модель, внешний ключ на модель).
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (Recipe, "shopping_carts_count", ShoppingCart, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Follow, "subscribing"),
+    (User, "following_count", Follow, "user"),
+)
+
+# Счетчики, которые обновляет код, пишущий связи пакетно в обход сигналов.
+BULK_COUNTERS = (
+    (Recipe, "ingredients_count", RecipeIngredients, "recipe"),
+)
+
+
+def change_counter(model, field, pk, delta):
+    """Атомарно изменяет счетчик на delta через F() без чтения строки."""
+
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(related_model, foreign_key):
+    """Подзапрос, пересчитывающий значение счетчика по связанной модели."""
+
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{foreign_key: OuterRef("pk")})
+            .order_by()
+            .values(foreign_key)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def refresh_counter(model, field, related_model, foreign_key, pks):
+    """Пересчитывает счетчик для записей pks по связанной модели."""
+
+    model.objects.filter(pk__in=pks).update(
+        **{field: actual_count(related_model, foreign_key)}
+    )
@@ -0,0 +1,94 @@
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from api.constants import (
+    AVATAR_IMAGE_VARIANTS,
+    IMAGE_VARIANT_FORMATS,
+    IMAGE_VARIANTS_DIR,
+    RECIPE_IMAGE_VARIANTS,
+)
+from .models import Recipe, User
+
+# Изображения с вариантами:
+# (модель, поле файла, поле с вариантами, размеры вариантов).
+IMAGE_FIELDS = (
+    (Recipe, "image", "image_variants", RECIPE_IMAGE_VARIANTS),
+    (User, "avatar", "avatar_variants", AVATAR_IMAGE_VARIANTS),
+)
+
+
+def get_formats():
+    """Форматы вариантов, которые умеет сохранять установленный Pillow."""
+
+    Image.init()
+    return {
+        extension: params
+        for extension, params in IMAGE_VARIANT_FORMATS.items()
+        if params[0] in Image.SAVE
+    }
+
+
+def variant_name(file, variant, extension):
+    """Имя варианта в каталоге вариантов рядом с загрузками поля."""
+
+    filename = posixpath.splitext(posixpath.basename(file.name))[0]
+    return posixpath.join(
+        file.field.upload_to,
+        IMAGE_VARIANTS_DIR,
+        f"{filename}_{variant}.{extension}",
+    )
+
+
+def flatten(image):
+    """Накладывает изображение с прозрачностью на белый фон."""
+
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def make_variants(file, sizes):
+    """
+    Сохраняет уменьшенные копии изображения во всех форматах без EXIF.
+    Возвращает {вариант: {"width", "height", расширение: имя файла}}.
+    """
+
+    storage = file.storage
+    with file.open("rb"):
+        image = ImageOps.exif_transpose(Image.open(file))
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+        "transparency" in image.info
+    )
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    formats = get_formats()
+    variants = {}
+    files = {}
+    for variant, size in sizes.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variants[variant] = {"width": resized.width, "height": resized.height}
+        for extension, (image_format, quality) in formats.items():
+            buffer = BytesIO()
+            (flatten(resized) if image_format == "JPEG" else resized).save(
+                buffer, image_format, quality=quality, optimize=True
+            )
+            name = variant_name(file, variant, extension)
+            files[name] = ContentFile(buffer.getvalue())
+            variants[variant][extension] = name
+    saved = storage.save_many(files)
+    for variant in variants.values():
+        for extension in formats:
+            variant[extension] = saved[variant[extension]]
+    return variants
+
+
+def variant_url(file, variants, variant, extension="jpeg"):
+    """Адрес варианта изображения или оригинала, если варианта нет."""
+
+    name = variants.get(variant, {}).get(extension)
+    return file.storage.url(name) if name else file.url
@@ -0,0 +1,72 @@
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from api.constants import IMAGE_VARIANT_FORMATS
+from .images import IMAGE_FIELDS
+from .models import MediaFile
+
+
+def referenced_files(name, variants):
+    """Файлы изображения: оригинал и все его варианты."""
+
+    if not name:
+        return set()
+    return {name} | {
+        variant[extension]
+        for variant in (variants or {}).values()
+        for extension in IMAGE_VARIANT_FORMATS
+        if extension in variant
+    }
+
+
+def count_references():
+    """Фактическое число ссылок на каждый файл: {имя: ссылок}."""
+
+    references = Counter()
+    for model, field, variants_field, _ in IMAGE_FIELDS:
+        for name, variants in (
+            model.objects.exclude(**{field: ""})
+            .exclude(**{f"{field}__isnull": True})
+            .values_list(field, variants_field)
+            .iterator()
+        ):
+            references.update(referenced_files(name, variants))
+    return references
+
+
+def change_references(added, removed):
+    """
+    Изменяет счетчики ссылок на файлы. Файлы, на которые
+    больше никто не ссылается, удаляются после коммита.
+    """
+
+    if added:
+        MediaFile.objects.bulk_create(
+            [MediaFile(name=name) for name in added], ignore_conflicts=True
+        )
+        MediaFile.objects.filter(name__in=added).update(
+            references=F("references") + 1
+        )
+    if removed:
+        MediaFile.objects.filter(name__in=removed, references__gt=0).update(
+            references=F("references") - 1
+        )
+        transaction.on_commit(lambda: delete_unused(removed))
+
+
+@transaction.atomic
+def delete_unused(names):
+    """Удаляет файлы из names, на которые не осталось ссылок."""
+
+    unused = list(
+        MediaFile.objects.select_for_update()
+        .filter(name__in=names, references=0)
+        .values_list("name", flat=True)
+    )
+    MediaFile.objects.filter(name__in=unused).delete()
+    for name in unused:
+        default_storage.delete(name)
+    return unused
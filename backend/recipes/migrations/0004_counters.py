@@ -0,0 +1,66 @@
+# Generated by Django 3.2 on 2026-10-18 03:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('Recipe', 'favorites_count', 'Favorite', 'recipe'),
+    ('Recipe', 'shopping_carts_count', 'ShoppingCart', 'recipe'),
+    ('FoodgramUser', 'recipes_count', 'Recipe', 'author'),
+    ('FoodgramUser', 'followers_count', 'Follow', 'subscribing'),
+    ('FoodgramUser', 'following_count', 'Follow', 'user'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for model_name, field, related_name, foreign_key in COUNTERS:
+        related_model = apps.get_model('recipes', related_name)
+        apps.get_model('recipes', model_name).objects.update(**{
+            field: Coalesce(
+                Subquery(
+                    related_model.objects.filter(
+                        **{foreign_key: OuterRef('pk')}
+                    ).order_by().values(foreign_key).annotate(
+                        total=Count('pk')
+                    ).values('total')
+                ),
+                0,
+            )
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписок'),
+        ),
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2 on 2026-10-18 03:34
+
+from collections import Counter
+
+from django.db import migrations, models
+
+IMAGE_FIELDS = (
+    ('Recipe', 'image', 'image_variants'),
+    ('FoodgramUser', 'avatar', 'avatar_variants'),
+)
+
+
+def fill_references(apps, schema_editor):
+    references = Counter()
+    for model_name, field, variants_field in IMAGE_FIELDS:
+        rows = apps.get_model('recipes', model_name).objects.exclude(
+            **{field: ''}
+        ).exclude(**{f'{field}__isnull': True})
+        for name, variants in rows.values_list(
+            field, variants_field
+        ).iterator():
+            references[name] += 1
+            references.update({
+                variant[extension]
+                for variant in (variants or {}).values()
+                for extension in ('webp', 'jpeg')
+                if extension in variant
+            })
+    MediaFile = apps.get_model('recipes', 'MediaFile')
+    MediaFile.objects.bulk_create(
+        (
+            MediaFile(name=name, references=count)
+            for name, count in references.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+            },
+        ),
+        migrations.RunPython(fill_references, migrations.RunPython.noop),
+    ]
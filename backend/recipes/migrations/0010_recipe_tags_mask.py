@@ -0,0 +1,35 @@
+# Generated by Django 3.2 on 2026-10-18 03:44
+
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef
+
+TAGS_MASK_BITS = 62
+
+
+def fill_tags_mask(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeTags = Recipe.tags.through
+    for tag_id in apps.get_model('recipes', 'Tag').objects.filter(
+        pk__lte=TAGS_MASK_BITS
+    ).values_list('pk', flat=True):
+        Recipe.objects.filter(
+            Exists(RecipeTags.objects.filter(
+                recipe=OuterRef('pk'), tag_id=tag_id
+            ))
+        ).update(tags_mask=F('tags_mask').bitor(1 << (tag_id - 1)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
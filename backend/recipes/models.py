@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model, validators
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
@@ -7,7 +8,35 @@ from django.db import models
 from api import constants
 
 
-class FoodgramUser(AbstractUser):
+class ComputedFieldsMixin:
+    """
+    Полное сохранение существующей записи не трогает поля, которые
+    меняются только через UPDATE (счетчики через F(), поисковый вектор):
+    иначе устаревшее значение из памяти затерло бы изменения
+    других запросов.
+    """
+
+    computed_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.computed_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class FoodgramUser(ComputedFieldsMixin, AbstractUser):
     """Модель для пользователей созданная для приложения foodgram"""
 
     email = models.EmailField(
@@ -32,8 +61,24 @@ class FoodgramUser(AbstractUser):
     avatar = models.ImageField(
         upload_to="avatars/", verbose_name="Аватар", null=True, default=""
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Варианты аватара",
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Рецептов"
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Подписчиков"
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Подписок"
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
+    computed_fields = ("recipes_count", "followers_count", "following_count")
 
     class Meta:
         """Мета-параметры модели"""
@@ -133,7 +178,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(ComputedFieldsMixin, models.Model):
     """Модель рецептов."""
 
     author = models.ForeignKey(
@@ -142,6 +187,9 @@ class Recipe(models.Model):
     name = models.CharField(max_length=constants.NAME_LENGTH,
                             verbose_name="Название")
     image = models.ImageField(upload_to="recipes/recipes", verbose_name="Фото")
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name="Варианты фото"
+    )
     text = models.TextField("Описание")
     cooking_time = models.PositiveIntegerField(
         validators=[MinValueValidator(constants.MIN_VALUE_COOKING_TIME)],
@@ -154,12 +202,38 @@ class Recipe(models.Model):
         through="RecipeIngredients"
     )
     tags = models.ManyToManyField(Tag, verbose_name="Список тэгов")
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="В избранном"
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="В списках покупок"
+    )
+    ingredients_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Продуктов"
+    )
+    # Бит N - 1 выставлен, если у рецепта есть тег с id N.
+    tags_mask = models.BigIntegerField(
+        default=0, editable=False, verbose_name="Маска тегов"
+    )
+    # Заполняется только на PostgreSQL, индекс GIN создает миграция.
+    search_vector = SearchVectorField(
+        null=True, editable=False, verbose_name="Поисковый вектор"
+    )
+    computed_fields = (
+        "favorites_count", "shopping_carts_count", "tags_mask",
+        "search_vector",
+    )
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         default_related_name = "recipes"
-        ordering = ("-pub_date",)
+        ordering = ("-pub_date", "-id")
+        indexes = [
+            models.Index(
+                fields=("-pub_date", "-id"), name="recipe_pub_date_id_idx"
+            )
+        ]
 
     def __str__(self):
         return f"{self.author} - {self.name[:constants.LETTER_COUNT]}"
@@ -191,6 +265,13 @@ class RecipeIngredients(models.Model):
         verbose_name = "Количество продукта"
         verbose_name_plural = "Количество продуктов"
         default_related_name = "recipe_ingredients"
+        # Обратный индекс «продукт → рецепты» для поиска по продуктам.
+        indexes = [
+            models.Index(
+                fields=("ingredient", "recipe"),
+                name="recipe_ingredient_lookup_idx",
+            )
+        ]
 
 
 class UserRecipeBaseModel(models.Model):
@@ -237,3 +318,87 @@ class ShoppingCart(UserRecipeBaseModel):
     class Meta(UserRecipeBaseModel.Meta):
         verbose_name = "Списки покупок"
         verbose_name_plural = "Список покупок"
+
+
+class ShoppingCartIngredient(models.Model):
+    """
+    Модель для суммарного количества продукта
+    по всем рецептам в списке покупок пользователя.
+    """
+
+    user = models.ForeignKey(
+        FoodgramUser,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, verbose_name="Продукт"
+    )
+    amount = models.PositiveIntegerField(verbose_name="Мера")
+
+    class Meta:
+        verbose_name = "Продукт в списке покупок"
+        verbose_name_plural = "Продукты в списках покупок"
+        default_related_name = "shopping_cart_ingredients"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_shopping_cart_ingredient",
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"У {self.user.username[:constants.LETTER_COUNT]} в списке "
+            f"{self.ingredient.name[:constants.LETTER_COUNT]} - {self.amount}"
+        )
+
+
+class MediaFile(models.Model):
+    """Модель для числа ссылок на файл в хранилище медиафайлов."""
+
+    name = models.CharField(
+        max_length=constants.MEDIA_NAME_LENGTH,
+        unique=True,
+        verbose_name="Файл",
+    )
+    references = models.PositiveIntegerField(
+        default=0, verbose_name="Ссылок"
+    )
+
+    class Meta:
+        verbose_name = "Медиафайл"
+        verbose_name_plural = "Медиафайлы"
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
+class SimilarRecipe(models.Model):
+    """Модель для заранее посчитанных похожих рецептов."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbours",
+        verbose_name="Рецепт",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbour_of",
+        verbose_name="Похожий рецепт",
+    )
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"], name="unique_similar_recipe"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} → {self.similar_id} ({self.score:.2f})"
@@ -0,0 +1,34 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+
+from api.constants import SEARCH_CONFIG
+from .models import Recipe, RecipeIngredients
+
+
+def search_vector():
+    """Вектор рецепта: название (вес A), продукты (B) и описание (C)."""
+
+    ingredient_names = Subquery(
+        RecipeIngredients.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", " "))
+        .values("names")
+    )
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight="B", config=SEARCH_CONFIG)
+        + SearchVector("text", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipes=None):
+    """Пересчитывает поисковые векторы рецептов одним UPDATE."""
+
+    if connection.vendor != "postgresql":
+        return 0
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    return recipes.update(search_vector=search_vector())
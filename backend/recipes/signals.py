@@ -0,0 +1,178 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save
+)
+
+from .counters import COUNTERS, change_counter
+from .images import IMAGE_FIELDS, make_variants
+from .media import change_references, referenced_files
+from .models import Ingredient, Recipe, Tag
+from .search import update_search_vectors
+from .tags import recipes_with_tag, tag_bit, update_tags_masks
+
+
+def increment_counter(model, field, foreign_key, instance, created, **kwargs):
+    if created:
+        change_counter(model, field, getattr(instance, f"{foreign_key}_id"), 1)
+
+
+def decrement_counter(model, field, foreign_key, instance, **kwargs):
+    change_counter(model, field, getattr(instance, f"{foreign_key}_id"), -1)
+
+
+def connect_counters():
+    """Подключает обновление денормализованных счетчиков к сигналам."""
+
+    for model, field, related_model, foreign_key in COUNTERS:
+        post_save.connect(
+            partial(increment_counter, model, field, foreign_key),
+            sender=related_model,
+            weak=False,
+            dispatch_uid=f"{model.__name__}.{field}.increment",
+        )
+        post_delete.connect(
+            partial(decrement_counter, model, field, foreign_key),
+            sender=related_model,
+            weak=False,
+            dispatch_uid=f"{model.__name__}.{field}.decrement",
+        )
+
+
+def remember_image(field, variants_field, instance, **kwargs):
+    """Запоминает сохраненное в базе изображение и его варианты."""
+
+    if field in instance.__dict__ and variants_field in instance.__dict__:
+        name = instance.__dict__[field]
+        instance.__dict__.setdefault("_stored_images", {})[field] = (
+            name if isinstance(name, str) else "",
+            instance.__dict__[variants_field] or {},
+        )
+
+
+def update_image(field, variants_field, sizes, sender, instance, created,
+                 **kwargs):
+    """
+    Создает варианты нового изображения и переносит ссылки
+    со старых файлов на новые.
+    """
+
+    stored = instance.__dict__.get("_stored_images", {})
+    if field not in stored:
+        return
+    name, variants = ("", {}) if created else stored[field]
+    file = getattr(instance, field)
+    new_variants = getattr(instance, variants_field)
+    if (file.name or "") != name:
+        new_variants = make_variants(file, sizes) if file else {}
+        setattr(instance, variants_field, new_variants)
+        sender.objects.filter(pk=instance.pk).update(
+            **{variants_field: new_variants}
+        )
+    old_files = referenced_files(name, variants)
+    new_files = referenced_files(file.name, new_variants)
+    change_references(new_files - old_files, old_files - new_files)
+    stored[field] = file.name or "", new_variants
+
+
+def release_image(field, variants_field, instance, **kwargs):
+    change_references(
+        set(),
+        referenced_files(
+            getattr(instance, field).name, getattr(instance, variants_field)
+        ),
+    )
+
+
+def connect_image_variants():
+    """
+    Подключает создание вариантов изображений и подсчет ссылок
+    на файлы к сигналам моделей.
+    """
+
+    for model, field, variants_field, sizes in IMAGE_FIELDS:
+        post_init.connect(
+            partial(remember_image, field, variants_field),
+            sender=model,
+            weak=False,
+            dispatch_uid=f"{model.__name__}.{field}.remember",
+        )
+        post_save.connect(
+            partial(update_image, field, variants_field, sizes),
+            sender=model,
+            weak=False,
+            dispatch_uid=f"{model.__name__}.{field}.update",
+        )
+        post_delete.connect(
+            partial(release_image, field, variants_field),
+            sender=model,
+            weak=False,
+            dispatch_uid=f"{model.__name__}.{field}.release",
+        )
+
+
+def update_recipe_search_vector(instance, **kwargs):
+    # После коммита продукты рецепта уже сохранены.
+    transaction.on_commit(
+        lambda: update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+    )
+
+
+def update_ingredient_search_vectors(instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(
+            lambda: update_search_vectors(
+                Recipe.objects.filter(ingredients=instance)
+            )
+        )
+
+
+def connect_search_vectors():
+    """Подключает пересчет поисковых векторов рецептов."""
+
+    post_save.connect(
+        update_recipe_search_vector,
+        sender=Recipe,
+        dispatch_uid="Recipe.search_vector",
+    )
+    post_save.connect(
+        update_ingredient_search_vectors,
+        sender=Ingredient,
+        dispatch_uid="Ingredient.search_vector",
+    )
+
+
+def update_recipe_tags_masks(instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        update_tags_masks([instance.pk])
+    elif action == "post_clear":
+        update_tags_masks(recipes_with_tag(instance.pk).values_list(
+            "pk", flat=True
+        ))
+    else:
+        update_tags_masks(pk_set)
+
+
+def clear_tag_bit(instance, **kwargs):
+    # Связи удаленного тега удаляются каскадом, без m2m_changed.
+    if tag_bit(instance.pk):
+        recipes_with_tag(instance.pk).update(
+            tags_mask=F("tags_mask").bitand(~tag_bit(instance.pk))
+        )
+
+
+def connect_tags_masks():
+    """Подключает пересчет масок тегов рецептов."""
+
+    m2m_changed.connect(
+        update_recipe_tags_masks,
+        sender=Recipe.tags.through,
+        dispatch_uid="Recipe.tags_mask",
+    )
+    post_delete.connect(
+        clear_tag_bit, sender=Tag, dispatch_uid="Tag.tags_mask"
+    )
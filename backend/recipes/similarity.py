@@ -0,0 +1,200 @@
+import heapq
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from api.constants import (
+    SIMILAR_CANDIDATES, SIMILAR_MAX_POSTING, SIMILAR_RECIPES_COUNT
+)
+from .models import Recipe, RecipeIngredients, SimilarRecipe
+
+BATCH_SIZE = 5000
+
+
+def load_features(recipe_ids=None):
+    """
+    Разреженные векторы рецептов: {recipe_id: множество признаков}.
+    Признак продукта — его id, признак тега — id со знаком минус.
+    """
+
+    ingredients = RecipeIngredients.objects.all()
+    tags = Recipe.tags.through.objects.all()
+    if recipe_ids is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        tags = tags.filter(recipe_id__in=recipe_ids)
+    features = defaultdict(set)
+    for recipe_id, ingredient_id in ingredients.values_list(
+        "recipe_id", "ingredient_id"
+    ).iterator():
+        features[recipe_id].add(ingredient_id)
+    for recipe_id, tag_id in tags.values_list(
+        "recipe_id", "tag_id"
+    ).iterator():
+        features[recipe_id].add(-tag_id)
+    return features
+
+
+def jaccard(first, second):
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared) if shared else 0.0
+
+
+def nearest(features, candidates, all_features, count):
+    """count ближайших по коэффициенту Жаккара: [(сходство, recipe_id)]."""
+
+    scored = (
+        (jaccard(features, all_features[candidate]), candidate)
+        for candidate in candidates
+    )
+    return heapq.nlargest(count, (item for item in scored if item[0] > 0))
+
+
+def compute_similar_recipes(count=SIMILAR_RECIPES_COUNT,
+                            max_posting=SIMILAR_MAX_POSTING,
+                            candidates=SIMILAR_CANDIDATES):
+    """
+    Соседи всех рецептов каталога. Произведение разреженной матрицы
+    «рецепт × признак» на транспонированную считается построчно
+    через обратные списки признаков: для рецепта суммируются только
+    списки его признаков, а не весь каталог.
+    """
+
+    features = load_features()
+    postings = defaultdict(list)
+    for recipe_id, recipe_features in features.items():
+        for feature in recipe_features:
+            postings[feature].append(recipe_id)
+    for recipe_id, recipe_features in features.items():
+        shared = Counter()
+        for feature in recipe_features:
+            if len(postings[feature]) <= max_posting:
+                shared.update(postings[feature])
+        del shared[recipe_id]
+        for score, similar_id in nearest(
+            recipe_features,
+            (similar_id for similar_id, _ in shared.most_common(candidates)),
+            features,
+            count,
+        ):
+            yield SimilarRecipe(
+                recipe_id=recipe_id, similar_id=similar_id, score=score
+            )
+
+
+@transaction.atomic
+def rebuild_similar_recipes(count=SIMILAR_RECIPES_COUNT,
+                            max_posting=SIMILAR_MAX_POSTING,
+                            batch_size=BATCH_SIZE):
+    SimilarRecipe.objects.all().delete()
+    rows = []
+    written = 0
+    for row in compute_similar_recipes(count, max_posting):
+        rows.append(row)
+        if len(rows) >= batch_size:
+            written += len(SimilarRecipe.objects.bulk_create(rows))
+            rows = []
+    return written + len(SimilarRecipe.objects.bulk_create(rows))
+
+
+def count_shared(postings, field, values, recipe_id, max_posting):
+    """
+    Строки (recipe_id, общих признаков) для рецептов, делящих с
+    recipe_id признаки из values. Признаки, встречающиеся чаще
+    max_posting раз, не учитываются.
+    """
+
+    selective = (
+        postings.filter(**{f"{field}__in": values})
+        .values(field)
+        .annotate(postings=Count("pk"))
+        .filter(postings__lte=max_posting)
+        .values(field)
+    )
+    return (
+        postings.filter(**{f"{field}__in": selective})
+        .exclude(recipe_id=recipe_id)
+        .values("recipe")
+        .annotate(shared=Count("pk"))
+        .values_list("recipe", "shared")
+    )
+
+
+@transaction.atomic
+def update_similar_recipes(recipe_id, count=SIMILAR_RECIPES_COUNT,
+                           max_posting=SIMILAR_MAX_POSTING):
+    """
+    Пересчитывает соседей одного рецепта после создания или изменения:
+    кандидаты берутся по обратным спискам продуктов и тегов, как при
+    полном пересчете, затем рецепт добавляется в списки соседей,
+    где он теперь попадает в первые count, а у ссылающихся на него
+    записей обновляется оценка.
+    """
+
+    features = load_features([recipe_id])[recipe_id]
+    shared = Counter()
+    for similar_id, features_shared in count_shared(
+        RecipeIngredients.objects.all(),
+        "ingredient",
+        [feature for feature in features if feature > 0],
+        recipe_id,
+        max_posting,
+    ).union(
+        count_shared(
+            Recipe.tags.through.objects.all(),
+            "tag",
+            [-feature for feature in features if feature < 0],
+            recipe_id,
+            max_posting,
+        ),
+        all=True,
+    ):
+        shared[similar_id] += features_shared
+    candidate_ids = [
+        similar_id
+        for similar_id, _ in shared.most_common(SIMILAR_CANDIDATES)
+    ]
+    pointing = {
+        row.recipe_id: row
+        for row in SimilarRecipe.objects.filter(similar_id=recipe_id)
+    }
+    all_features = load_features({*candidate_ids, *pointing})
+    neighbours = nearest(features, candidate_ids, all_features, count)
+    SimilarRecipe.objects.filter(recipe_id=recipe_id).delete()
+    SimilarRecipe.objects.bulk_create(
+        SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id, score=score)
+        for score, similar_id in neighbours
+    )
+
+    changed, removed = [], []
+    for row in pointing.values():
+        row.score = jaccard(features, all_features[row.recipe_id])
+        if row.score:
+            changed.append(row)
+        else:
+            removed.append(row.pk)
+    SimilarRecipe.objects.bulk_update(changed, ["score"])
+    SimilarRecipe.objects.filter(pk__in=removed).delete()
+
+    lists = defaultdict(list)
+    for row in SimilarRecipe.objects.filter(
+        recipe_id__in=[
+            similar_id for _, similar_id in neighbours
+            if similar_id not in pointing
+        ]
+    ):
+        lists[row.recipe_id].append(row)
+    added, displaced = [], []
+    for score, similar_id in neighbours:
+        if similar_id in pointing:
+            continue
+        rows = lists[similar_id]
+        weakest = min(rows, key=lambda row: row.score, default=None)
+        if len(rows) < count or score > weakest.score:
+            added.append(SimilarRecipe(
+                recipe_id=similar_id, similar_id=recipe_id, score=score
+            ))
+            if len(rows) >= count:
+                displaced.append(weakest.pk)
+    SimilarRecipe.objects.filter(pk__in=displaced).delete()
+    SimilarRecipe.objects.bulk_create(added)
@@ -0,0 +1,43 @@
+from collections import defaultdict
+
+from django.db.models import F
+
+from api.constants import TAGS_MASK_BITS
+from .models import Recipe
+
+
+def tag_bit(tag_id):
+    """Бит тега в маске или 0, если тег в маску не помещается."""
+
+    return 1 << (tag_id - 1) if 0 < tag_id <= TAGS_MASK_BITS else 0
+
+
+def tags_mask(tag_ids):
+    mask = 0
+    for tag_id in tag_ids:
+        mask |= tag_bit(tag_id)
+    return mask
+
+
+def update_tags_masks(recipe_ids):
+    """Пересчитывает маски тегов рецептов по таблице связей."""
+
+    masks = dict.fromkeys(recipe_ids, 0)
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        recipe_id__in=masks
+    ).values_list("recipe_id", "tag_id"):
+        masks[recipe_id] |= tag_bit(tag_id)
+    # Различных масок немного: один UPDATE на каждую.
+    by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        by_mask[mask].append(recipe_id)
+    for mask, pks in by_mask.items():
+        Recipe.objects.filter(pk__in=pks).update(tags_mask=mask)
+
+
+def recipes_with_tag(tag_id):
+    """Рецепты, в маске которых выставлен бит тега."""
+
+    return Recipe.objects.alias(
+        tag_bits=F("tags_mask").bitand(tag_bit(tag_id))
+    ).filter(tag_bits__gt=0)
@@ -0,0 +1,474 @@
+"""
+Нагрузочный прогон API по postman-коллекции.
+
+Папки коллекции превращаются во взвешенные сценарии, которые параллельно
+выполняют виртуальные пользователи. Переменные коллекции ({{userToken}},
+{{firstRecipeId}} и т.д.) извлекаются из ответов так же,
+как это делают тестовые скрипты Postman.
+
+Пример:
+    python load_test.py --base-url http://127.0.0.1:8000 \\
+        --concurrency 20 --ramp-up 10 --duration 60 \\
+        --weight "recipes/*=5" --weight "*bad_requests=0"
+"""
+
+import argparse
+import bisect
+import fnmatch
+import http.client
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+COLLECTION = Path(__file__).with_name("foodgram.postman_collection.json")
+SETUP_SCENARIOS = (
+    "register_and_get_tokens/*",
+    "tags/get_tags_info",
+    "ingredients/get_ingradients",
+)
+DEFAULT_WEIGHTS = (("register_and_get_tokens/*", 0),)
+LOGIN_URL = "/api/auth/token/login/"
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+PERCENTILES = (50, 95, 99)
+VARIABLE = re.compile(r"\{\{(\w+)\}\}")
+SET_VARIABLE = re.compile(
+    r"pm\.\w+\.set\(\s*['\"](\w+)['\"]\s*,\s*(.+)\)\s*;?\s*$"
+)
+GET_ALIAS = re.compile(
+    r"(?:const|let|var)\s+(\w+)\s*=\s*_\.get\(\s*responseData\s*,"
+    r"\s*['\"]([\w.\[\]]+)['\"]\s*\)"
+)
+PATH_STEP = re.compile(r"\[(\d+)\]|\.?(\w+)")
+SLICE = re.compile(r"\.slice\(\s*(\d+)\s*,\s*(\d+)\s*\)$")
+
+
+@dataclass
+class Request:
+    name: str
+    method: str
+    url: str
+    headers: dict
+    body: str = None
+    extract: dict = field(default_factory=dict)
+
+
+@dataclass
+class Scenario:
+    name: str
+    requests: list
+
+
+def parse_path(expression):
+    """Превращает responseData[0].name или id в список шагов пути."""
+
+    steps = []
+    for index, key in PATH_STEP.findall(expression):
+        steps.append(int(index) if index else key)
+    return steps
+
+
+def parse_extractions(events):
+    """
+    Находит в тестовых скриптах вызовы pm.*.set(...) и возвращает
+    {переменная: (путь в ответе, срез)}.
+    """
+
+    lines = [
+        line
+        for event in events
+        if event.get("listen") == "test"
+        for line in event["script"].get("exec", [])
+    ]
+    aliases = {}
+    for line in lines:
+        for alias, path in GET_ALIAS.findall(line):
+            aliases[alias] = parse_path(path)
+    extract = {}
+    for line in lines:
+        match = SET_VARIABLE.search(line)
+        if not match:
+            continue
+        name, expression = match.groups()
+        expression = expression.strip()
+        slice_match = SLICE.search(expression)
+        text_slice = None
+        if slice_match:
+            text_slice = tuple(map(int, slice_match.groups()))
+            expression = expression[:slice_match.start()]
+        if expression in aliases:
+            extract[name] = (aliases[expression], text_slice)
+        elif expression.startswith("responseData"):
+            extract[name] = (
+                parse_path(expression[len("responseData"):]), text_slice
+            )
+    return extract
+
+
+def parse_request(item, inherited_auth):
+    request = item["request"]
+    url = request["url"]
+    headers = {
+        header["key"]: header["value"]
+        for header in request.get("header", [])
+        if not header.get("disabled")
+    }
+    # Как и в Postman, запрос без своей авторизации наследует ее от папки.
+    auth = request.get("auth") or inherited_auth or {}
+    if auth.get("type") == "apikey":
+        apikey = {entry["key"]: entry["value"] for entry in auth["apikey"]}
+        headers[apikey.get("key", "Authorization")] = apikey["value"]
+    body = request.get("body") or {}
+    raw = body.get("raw") if body.get("mode") == "raw" else None
+    if raw is not None:
+        headers.setdefault("Content-Type", "application/json")
+    return Request(
+        name=item["name"],
+        method=request["method"],
+        url=url["raw"] if isinstance(url, dict) else url,
+        headers=headers,
+        body=raw,
+        extract=parse_extractions(item.get("event", [])),
+    )
+
+
+def load_scenarios(path):
+    """Сценарий — папка второго уровня коллекции: «recipes/get_recipes»."""
+
+    with open(path, encoding="utf-8") as file:
+        collection = json.load(file)
+    variables = {
+        variable["key"]: variable["value"]
+        for variable in collection.get("variable", [])
+    }
+    scenarios = []
+
+    def walk(items, prefix, auth):
+        requests = []
+        for item in items:
+            name = item["name"].split("//")[0].strip()
+            if "item" in item:
+                walk(
+                    item["item"], f"{prefix}{name}/", item.get("auth") or auth
+                )
+            else:
+                requests.append(parse_request(item, auth))
+        if requests:
+            scenarios.append(Scenario(prefix.rstrip("/"), requests))
+
+    walk(collection["item"], "", collection.get("auth"))
+    return scenarios, variables
+
+
+def substitute(text, variables):
+    return VARIABLE.sub(
+        lambda match: str(variables.get(match.group(1), match.group(0))),
+        text,
+    )
+
+
+def extract_value(data, path, text_slice):
+    for step in path:
+        data = data[step]
+    if text_slice:
+        data = data[slice(*text_slice)]
+    return data
+
+
+class Stats:
+    """Задержки и статусы ответов по каждому запросу."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    def add(self, name, latency, status):
+        self.latencies[name].append(latency)
+        self.statuses[name][status] += 1
+        if status is None or status >= 500:
+            self.errors[name] += 1
+
+    def merge(self, other):
+        for name, latencies in other.latencies.items():
+            self.latencies[name].extend(latencies)
+            for status, count in other.statuses[name].items():
+                self.statuses[name][status] += count
+            self.errors[name] += other.errors[name]
+
+    def report(self, elapsed):
+        routes = {}
+        for name, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+            for latency in latencies:
+                histogram[
+                    bisect.bisect_left(HISTOGRAM_BUCKETS_MS, latency * 1000)
+                ] += 1
+            routes[name] = {
+                "count": len(latencies),
+                "error_rate": round(self.errors[name] / len(latencies), 4),
+                "statuses": {
+                    str(status): count
+                    for status, count in self.statuses[name].items()
+                },
+                **{
+                    f"p{percent}_ms": round(
+                        latencies[
+                            max(0, -(-len(latencies) * percent // 100) - 1)
+                        ] * 1000,
+                        2,
+                    )
+                    for percent in PERCENTILES
+                },
+                "histogram_ms": dict(zip(
+                    [f"<={bucket}" for bucket in HISTOGRAM_BUCKETS_MS]
+                    + [f">{HISTOGRAM_BUCKETS_MS[-1]}"],
+                    histogram,
+                )),
+            }
+        total = sum(route["count"] for route in routes.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "rps": round(total / elapsed, 1) if elapsed else 0,
+            "error_rate": round(
+                sum(self.errors.values()) / total, 4
+            ) if total else 0,
+            "routes": routes,
+        }
+
+
+class Client:
+    """HTTP-клиент с keep-alive соединением для одного потока."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.connection = connection_class(parts.netloc, timeout=timeout)
+        self.base_url = base_url
+
+    def send(self, method, url, headers, body):
+        if url.startswith(self.base_url):
+            url = url[len(self.base_url):] or "/"
+        url = quote(url, safe="/?&=%:+,;@")
+        payload = body.encode() if body is not None else None
+        try:
+            self.connection.request(method, url, payload, headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            raise
+
+    def execute(self, request, variables, stats, prefix):
+        """Выполняет запрос коллекции и сохраняет извлеченные переменные."""
+
+        headers = {
+            key: substitute(value, variables)
+            for key, value in request.headers.items()
+        }
+        if headers.get("Authorization", "").startswith("Token {{"):
+            headers.pop("Authorization")
+        body = substitute(request.body, variables) if request.body else None
+        start = time.perf_counter()
+        try:
+            status, content = self.send(
+                request.method,
+                substitute(request.url, variables),
+                headers,
+                body,
+            )
+        except (OSError, http.client.HTTPException):
+            status, content = None, b""
+        stats.add(f"{prefix}/{request.name}", time.perf_counter() - start,
+                  status)
+        if not request.extract or status is None or status >= 400:
+            return
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return
+        for name, (path, text_slice) in request.extract.items():
+            try:
+                variables[name] = extract_value(data, path, text_slice)
+            except (KeyError, IndexError, TypeError):
+                pass
+
+
+def login(client, email, password):
+    status, content = client.send(
+        "POST",
+        LOGIN_URL,
+        {"Content-Type": "application/json"},
+        json.dumps({"email": email, "password": password}),
+    )
+    if status != 200:
+        raise SystemExit(f"Не удалось получить токен для {email}: {status}")
+    return json.loads(content)["auth_token"]
+
+
+def parse_weights(values):
+    weights = []
+    for value in values:
+        pattern, _, weight = value.rpartition("=")
+        weights.append((pattern, float(weight)))
+    return weights
+
+
+def scenario_weight(scenario, weights):
+    weight = 1.0
+    for pattern, value in weights:
+        if fnmatch.fnmatch(scenario.name, pattern):
+            weight = value
+    return weight
+
+
+def worker(number, args, scenarios, cum_weights, variables, deadline,
+           results):
+    time.sleep(args.ramp_up * number / args.concurrency)
+    rng = random.Random(args.seed + number)
+    client = Client(args.base_url, args.timeout)
+    stats = Stats()
+    # Каждый виртуальный пользователь ведет свою копию переменных:
+    # идентификаторы, созданные его сценариями, видны только ему.
+    variables = dict(variables)
+    iterations = 0
+    while time.monotonic() < deadline and (
+        not args.iterations or iterations < args.iterations
+    ):
+        scenario = rng.choices(scenarios, cum_weights=cum_weights)[0]
+        for request in scenario.requests:
+            client.execute(request, variables, stats, scenario.name)
+        iterations += 1
+    results[number] = stats
+
+
+def print_report(report):
+    print(
+        f"Запросов: {report['requests']} за {report['elapsed_s']} с, "
+        f"{report['rps']} rps, ошибок {report['error_rate']:.2%}"
+    )
+    for name, route in report["routes"].items():
+        print(
+            f"{name[:60]:<60} {route['count']:>6}  "
+            f"p50 {route['p50_ms']:>8.1f}  p95 {route['p95_ms']:>8.1f}  "
+            f"p99 {route['p99_ms']:>8.1f} мс  "
+            f"ошибок {route['error_rate']:.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--collection", default=COLLECTION)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--ramp-up", type=float, default=0,
+        help="За сколько секунд запускаются все виртуальные пользователи",
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument(
+        "--iterations", type=int, default=0,
+        help="Ограничение числа сценариев на пользователя (0 — без него)",
+    )
+    parser.add_argument(
+        "--weight", action="append", default=[],
+        help="Вес сценариев по шаблону: «recipes/*=5»; 0 исключает",
+    )
+    parser.add_argument(
+        "--setup", action="append",
+        help="Шаблон сценариев, выполняемых один раз перед нагрузкой; "
+        "по умолчанию регистрация, токены, теги и ингредиенты",
+    )
+    parser.add_argument(
+        "--login", action="append", default=[],
+        help="Получить токен заранее: «userToken=email:password»",
+    )
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл для отчета в JSON")
+    parser.add_argument(
+        "--list", action="store_true", help="Показать сценарии и выйти"
+    )
+    args = parser.parse_args()
+
+    scenarios, variables = load_scenarios(args.collection)
+    if args.base_url:
+        variables["baseUrl"] = args.base_url
+    args.base_url = variables["baseUrl"].rstrip("/")
+    weights = list(DEFAULT_WEIGHTS) + parse_weights(args.weight)
+    setup = [
+        scenario for scenario in scenarios
+        if any(
+            fnmatch.fnmatch(scenario.name, pattern)
+            for pattern in args.setup or SETUP_SCENARIOS
+        )
+    ]
+    load = [
+        (scenario, scenario_weight(scenario, weights))
+        for scenario in scenarios
+    ]
+    load = [(scenario, weight) for scenario, weight in load if weight > 0]
+    if args.list:
+        for scenario, weight in load:
+            print(f"{weight:>6g}  {scenario.name} ({len(scenario.requests)})")
+        return
+    if not load:
+        raise SystemExit("Нет сценариев с положительным весом")
+
+    client = Client(args.base_url, args.timeout)
+    setup_stats = Stats()
+    for scenario in setup:
+        for request in scenario.requests:
+            client.execute(request, variables, setup_stats, scenario.name)
+    for value in args.login:
+        name, _, credentials = value.partition("=")
+        email, _, password = credentials.partition(":")
+        variables[name] = login(client, email, password)
+
+    weighted, load_weights = zip(*load)
+    cum_weights = []
+    total = 0
+    for weight in load_weights:
+        total += weight
+        cum_weights.append(total)
+    results = {}
+    start = time.monotonic()
+    deadline = start + args.ramp_up + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(number, args, weighted, cum_weights, variables,
+                  deadline, results),
+            daemon=True,
+        )
+        for number in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = Stats()
+    for worker_stats in results.values():
+        stats.merge(worker_stats)
+    report = stats.report(time.monotonic() - start)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    return 1 if report["error_rate"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())